@@ -0,0 +1,330 @@
+import functools
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, fields, is_dataclass
+from typing import Callable, Dict, Hashable, Optional
+
+from apis.cache_backends import SharedCacheBackend, backend_from_env
+
+logger = logging.getLogger(__name__)
+
+# Every entity cache by name, for the admin cache console
+CACHES: Dict[str, "EntityCache"] = {}
+# Store shared by every app instance, if one is configured
+SHARED_BACKEND = backend_from_env()
+# Seconds a process serves an entry from memory before checking it against the shared store
+SHARED_RECHECK = 60
+
+
+def approximate_size(value, _seen=None) -> int:
+    """Rough deep size in bytes of a cached value (dicts, lists, tuples, strings and dataclass records)."""
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approximate_size(k, _seen) + approximate_size(v, _seen) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(item, _seen) for item in value)
+    elif is_dataclass(value) and not isinstance(value, type):
+        size += sum(approximate_size(getattr(value, f.name), _seen) for f in fields(value))
+    return size
+
+
+def budget_from_env(name: str, default_mb: float) -> int:
+    """Memory budget in bytes for a cache, overridable with SUPPORT_REPORTS_<NAME>_CACHE_MB."""
+    value = os.environ.get(f"SUPPORT_REPORTS_{name.upper()}_CACHE_MB")
+    return int(float(value if value else default_mb) * 1024 * 1024)
+
+
+def use_shared_backend(backend: Optional[SharedCacheBackend]):
+    """Share every entity cache, including ones created later, through `backend` (None to stop sharing)."""
+    global SHARED_BACKEND
+    SHARED_BACKEND = backend
+    for cache in CACHES.values():
+        cache.backend = backend
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stale_hits: int = 0
+    shared_hits: int = 0
+    refreshes: int = 0
+    refresh_failures: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class EntityCache:
+    """
+    Thread-safe LRU cache for API responses, bounded by a memory budget.
+
+    Each entry's size is estimated when it is stored; the least recently used
+    entries are evicted once the total exceeds `max_bytes` (or the entry count
+    exceeds `max_entries`). Entries older than `ttl` seconds are treated as misses.
+
+    With `max_stale` set, entries between `ttl` and `max_stale` seconds old are
+    stale rather than expired: they are still served, and the caller refreshes
+    them in the background (stale-while-revalidate). Only entries older than
+    `max_stale` make the caller wait for a fresh fetch.
+
+    With a shared `backend`, the in-process entries are a first level in front
+    of a store shared by every app instance. Misses are looked up there before
+    calling the API, fills hold a cross-process lock so only one instance
+    fetches a given entry, and local entries are checked against the shared
+    store every SHARED_RECHECK seconds so invalidations reach every instance.
+
+    `namespace` groups related caches in the cache console (e.g. agents, groups
+    and requesters are all "directories"); it defaults to the cache's name.
+    """
+
+    def __init__(self, name: str, max_bytes: int, ttl: Optional[int] = None, max_entries: Optional[int] = None, max_stale: Optional[int] = None, namespace: Optional[str] = None, backend: Optional[SharedCacheBackend] = None):
+        self.name = name
+        self.namespace = namespace or name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_stale = max_stale
+        self.backend = backend
+        self.stats = CacheStats()
+        # key -> (value, size, stored_at, checked_at), least recently used first
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    @property
+    def max_age(self) -> Optional[int]:
+        """Age after which an entry is no longer served at all."""
+        return self.max_stale if self.max_stale is not None else self.ttl
+
+    def lookup(self, key: Hashable):
+        """
+        Returns:
+            tuple: (hit, value, stale). On a miss value is None; stale is True for
+            a hit that is past `ttl` and should be refreshed.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if self.backend is not None and (entry is None or time.time() - entry[3] >= SHARED_RECHECK):
+            entry = self._lookup_shared(key)
+        with self._lock:
+            stale = False
+            if entry is not None and self.ttl is not None:
+                age = time.time() - entry[2]
+                if age >= self.max_age:
+                    self._remove(key)
+                    self.stats.expirations += 1
+                    entry = None
+                elif age >= self.ttl:
+                    stale = True
+            if entry is None:
+                self.stats.misses += 1
+                return False, None, False
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            if stale:
+                self.stats.stale_hits += 1
+            else:
+                self.stats.hits += 1
+            return True, entry[0], stale
+
+    def fill(self, key: Hashable, load: Callable, fresh: bool = False):
+        """
+        Load an entry and store it.
+
+        With a shared backend, the load runs under a cross-process lock, and an
+        entry another instance stored in the meantime is used instead of loading
+        it again (only a fresh one if `fresh` is set).
+        """
+        if self.backend is None:
+            value = load()
+            self.put(key, value)
+            return value
+        with self.backend.lock(self.name, key):
+            entry = self._lookup_shared(key)
+            if entry is not None:
+                age = time.time() - entry[2]
+                limit = self.ttl if fresh else self.max_age
+                if limit is None or age < limit:
+                    return entry[0]
+            value = load()
+            self.put(key, value)
+            return value
+
+    def refresh_in_background(self, key: Hashable, load: Callable):
+        """Reload an entry in a daemon thread, unless a refresh of it is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.fill(key, load, fresh=True)
+                self.stats.refreshes += 1
+            except Exception:
+                self.stats.refresh_failures += 1
+                logger.warning("Background refresh of %s entry %r failed", self.name, key, exc_info=True)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def put(self, key: Hashable, value):
+        stored_at = time.time()
+        self._put_local(key, value, stored_at)
+        if self.backend is not None:
+            self.backend.set(self.name, key, value, stored_at, self.max_age)
+
+    def invalidate(self, key: Hashable = None):
+        """Drop one entry, or every entry if no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._remove(key)
+        if self.backend is not None:
+            self.backend.delete(self.name, key)
+
+    def invalidate_where(self, predicate: Callable[[Hashable, object], bool]) -> int:
+        """
+        Drop every entry for which `predicate(key, value)` is true.
+
+        Every shared entry's value is loaded to test it; use
+        `invalidate_keys_where` when the key is enough.
+
+        Returns:
+            int: The number of entries dropped.
+        """
+        with self._lock:
+            keys = {key for key, (value, _, _, _) in self._entries.items() if predicate(key, value)}
+            for key in keys:
+                self._remove(key)
+        if self.backend is not None:
+            for key, value in list(self.backend.items(self.name)):
+                if key in keys or predicate(key, value):
+                    self.backend.delete(self.name, key)
+                    keys.add(key)
+        return len(keys)
+
+    def invalidate_keys_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Drop every entry for which `predicate(key)` is true.
+
+        Unlike `invalidate_where`, shared entries are matched on their keys alone,
+        without loading their values.
+
+        Returns:
+            int: The number of entries dropped.
+        """
+        with self._lock:
+            keys = {key for key in self._entries if predicate(key)}
+            for key in keys:
+                self._remove(key)
+        if self.backend is not None:
+            for key in list(self.backend.keys(self.name)):
+                if key in keys or predicate(key):
+                    self.backend.delete(self.name, key)
+                    keys.add(key)
+        return len(keys)
+
+    def stored_at(self, key: Hashable) -> Optional[float]:
+        """When an entry was stored, here or in the shared store, or None if it isn't cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if self.backend is not None and (entry is None or time.time() - entry[3] >= SHARED_RECHECK):
+            entry = self._lookup_shared(key)
+        return entry[2] if entry is not None else None
+
+    def oldest_age(self) -> Optional[float]:
+        """Seconds since the oldest entry still cached was stored."""
+        with self._lock:
+            if not self._entries:
+                return None
+            return time.time() - min(entry[2] for entry in self._entries.values())
+
+    def _lookup_shared(self, key: Hashable) -> Optional[tuple]:
+        """Copy an entry from the shared store into this process, or drop it here if the store no longer has it."""
+        found = self.backend.get(self.name, key)
+        if found is None:
+            with self._lock:
+                self._remove(key)
+            return None
+        value, stored_at = found
+        self.stats.shared_hits += 1
+        return self._put_local(key, value, stored_at)
+
+    def _put_local(self, key: Hashable, value, stored_at: float) -> tuple:
+        size = approximate_size(value)
+        entry = (value, size, stored_at, time.time())
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while self._entries and (
+                self._bytes > self.max_bytes
+                or (self.max_entries is not None and len(self._entries) > self.max_entries)
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats.evictions += 1
+        return entry
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+
+def entity_cache(name: str, max_bytes: int, ttl: Optional[int] = None, max_entries: Optional[int] = None, max_stale: Optional[int] = None, namespace: Optional[str] = None) -> Callable:
+    """
+    Cache a FreshdeskAPI method in a named EntityCache, keyed by its arguments.
+
+    Like `st.cache_resource`, the cache is shared by the whole process and the
+    first argument (the instance, or a client for plain functions) isn't part
+    of the key. Positional and keyword calls share entries. With `max_stale`,
+    stale entries are served immediately and refreshed in the background. If
+    SUPPORT_REPORTS_CACHE_BACKEND is set, entries are also shared with the other
+    app instances. The cache is available as the wrapped method's `cache`
+    attribute.
+    """
+    cache = CACHES.setdefault(name, EntityCache(name, max_bytes, ttl=ttl, max_entries=max_entries, max_stale=max_stale, namespace=namespace, backend=SHARED_BACKEND))
+
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(bound.arguments.values())[1:]
+            hit, value, stale = cache.lookup(key)
+            if stale:
+                cache.refresh_in_background(key, lambda: method(self, *key))
+            if hit:
+                return value
+            return cache.fill(key, lambda: method(self, *key))
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
@@ -0,0 +1,336 @@
+"""
+Shared storage behind the entity caches, so several app instances share one copy of each API response.
+
+Configure with SUPPORT_REPORTS_CACHE_BACKEND:
+
+    sqlite:////mnt/shared/support-reports-cache.db   (a file on a volume every instance mounts)
+    redis://cache-host:6379/0                        (needs the `redis` package)
+
+Without it every instance keeps its own in-process caches, as before.
+
+Entries are pickled, and unpickling runs code, so anyone who can write to the
+store can run code in every app instance. Keep the store where only the app can
+reach it (e.g. a Redis with a password on a private network), and set
+SUPPORT_REPORTS_CACHE_SECRET to the same value on every instance to have
+entries signed: entries without a valid signature are then ignored rather than
+unpickled.
+"""
+import abc
+import contextlib
+import hashlib
+import hmac
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Hashable, Iterator, Optional, Tuple
+
+# How long a fill lock is held at most, in case the process holding it dies
+LOCK_TIMEOUT = 120
+# How often a waiting process checks whether a fill lock was released
+LOCK_POLL_INTERVAL = 0.1
+# Length of the HMAC-SHA256 signature in front of signed payloads
+SIGNATURE_BYTES = hashlib.sha256().digest_size
+
+
+def entry_id(cache_name: str, key: Hashable) -> str:
+    """Stable identifier of a cache entry. Keys are tuples of ints, strings, None and frozen dataclasses."""
+    return f"{cache_name}:{key!r}"
+
+
+class SharedCacheBackend(abc.ABC):
+    """
+    Interface of a shared cache store. Subclasses implement every abstract method.
+
+    Entries are stored pickled with the time their value was fetched, so every
+    instance applies the same TTL and staleness rules to them. Keys are stored
+    apart from values, so listing the keys of a cache doesn't load its values.
+    With a `secret`, payloads are signed and ones that don't verify are ignored.
+    """
+
+    def __init__(self, secret: Optional[str] = None):
+        self.secret = secret.encode() if secret else None
+
+    def dumps(self, obj) -> bytes:
+        """Pickle an object, signed if the backend has a secret."""
+        payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.secret is None:
+            return payload
+        return hmac.new(self.secret, payload, hashlib.sha256).digest() + payload
+
+    def loads(self, payload: bytes):
+        """
+        Unpickle a stored object.
+
+        Raises:
+            ValueError: If the backend has a secret and the payload's signature doesn't match.
+        """
+        if self.secret is not None:
+            signature, payload = payload[:SIGNATURE_BYTES], payload[SIGNATURE_BYTES:]
+            if not hmac.compare_digest(signature, hmac.new(self.secret, payload, hashlib.sha256).digest()):
+                raise ValueError("Shared cache entry has an invalid signature")
+        return pickle.loads(payload)
+
+    @abc.abstractmethod
+    def get(self, cache_name: str, key: Hashable) -> Optional[Tuple[object, float]]:
+        """(value, stored_at) for an entry, or None if it isn't stored."""
+
+    @abc.abstractmethod
+    def set(self, cache_name: str, key: Hashable, value, stored_at: float, expire: Optional[int]):
+        """Store an entry, dropping it after `expire` seconds if given."""
+
+    @abc.abstractmethod
+    def delete(self, cache_name: str, key: Hashable = None):
+        """Drop one entry, or every entry of the cache if no key is given."""
+
+    @abc.abstractmethod
+    def items(self, cache_name: str) -> Iterator[Tuple[Hashable, object]]:
+        """(key, value) for every stored entry of a cache."""
+
+    @abc.abstractmethod
+    def keys(self, cache_name: str) -> Iterator[Hashable]:
+        """The key of every stored entry of a cache, without loading the values."""
+
+    @contextlib.contextmanager
+    def lock(self, cache_name: str, key: Hashable, blocking: bool = True):
+        """
+        Hold a cross-process lock on one entry while it is being filled.
+
+        Yields:
+            bool: True if the lock was acquired. Without `blocking`, False if
+            another process holds it; when blocking, False if waiting timed out.
+        """
+        token = uuid.uuid4().hex
+        name = entry_id(cache_name, key)
+        deadline = time.time() + LOCK_TIMEOUT
+        acquired = self._acquire(name, token)
+        while not acquired and blocking and time.time() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            acquired = self._acquire(name, token)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                self._release(name, token)
+
+    @abc.abstractmethod
+    def _acquire(self, name: str, token: str) -> bool:
+        """Take the named lock for `token` without waiting; True if it was free."""
+
+    @abc.abstractmethod
+    def _release(self, name: str, token: str):
+        """Release the named lock if `token` still holds it."""
+
+
+class SQLiteBackend(SharedCacheBackend):
+    """Shared cache in a SQLite file, for instances on one host or with a shared volume."""
+
+    def __init__(self, path: str, secret: Optional[str] = None):
+        super().__init__(secret)
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(entries)")]
+            if columns and "key" not in columns:
+                # Written before keys had a column of their own; it's only a cache
+                conn.execute("DROP TABLE entries")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(id TEXT PRIMARY KEY, cache TEXT, key BLOB, payload BLOB, stored_at REAL, expires_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_cache ON entries (cache)")
+            conn.execute("CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, token TEXT, expires_at REAL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; autocommit, with WAL so readers don't block the writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, cache_name, key):
+        row = self._connection().execute(
+            "SELECT payload, stored_at FROM entries WHERE id = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (entry_id(cache_name, key), time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            value = self.loads(row[0])
+        except ValueError:
+            return None
+        return value, row[1]
+
+    def set(self, cache_name, key, value, stored_at, expire):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                entry_id(cache_name, key), cache_name, self.dumps(key), self.dumps(value),
+                stored_at, stored_at + expire if expire is not None else None,
+            ),
+        )
+
+    def delete(self, cache_name, key=None):
+        conn = self._connection()
+        if key is None:
+            conn.execute("DELETE FROM entries WHERE cache = ?", (cache_name,))
+        else:
+            conn.execute("DELETE FROM entries WHERE id = ?", (entry_id(cache_name, key),))
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+
+    def items(self, cache_name):
+        rows = self._connection().execute(
+            "SELECT key, payload FROM entries WHERE cache = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (cache_name, time.time()),
+        ).fetchall()
+        for key_payload, payload in rows:
+            try:
+                yield self.loads(key_payload), self.loads(payload)
+            except ValueError:
+                continue
+
+    def keys(self, cache_name):
+        rows = self._connection().execute(
+            "SELECT key FROM entries WHERE cache = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (cache_name, time.time()),
+        ).fetchall()
+        for (key_payload,) in rows:
+            try:
+                yield self.loads(key_payload)
+            except ValueError:
+                continue
+
+    def _acquire(self, name, token):
+        conn = self._connection()
+        now = time.time()
+        conn.execute("DELETE FROM locks WHERE name = ? AND expires_at <= ?", (name, now))
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO locks VALUES (?, ?, ?)", (name, token, now + LOCK_TIMEOUT)
+        ).rowcount
+        return inserted == 1
+
+    def _release(self, name, token):
+        self._connection().execute("DELETE FROM locks WHERE name = ? AND token = ?", (name, token))
+
+
+class RedisBackend(SharedCacheBackend):
+    """Shared cache in Redis (or anything that speaks its protocol, e.g. fakeredis in tests)."""
+
+    PREFIX = "support-reports:"
+
+    def __init__(self, client, secret: Optional[str] = None):
+        super().__init__(secret)
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str, secret: Optional[str] = None) -> "RedisBackend":
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("A redis:// cache backend needs the redis package (pip install redis)")
+        return cls(redis.Redis.from_url(url), secret)
+
+    def _entry_key(self, cache_name, key) -> str:
+        return f"{self.PREFIX}entry:{entry_id(cache_name, key)}"
+
+    def _index_key(self, cache_name) -> str:
+        # Hash of one cache's entry keys to their pickled cache keys, so the cache
+        # can be listed and cleared without SCAN, and its keys read without the values
+        return f"{self.PREFIX}keys:{cache_name}"
+
+    def get(self, cache_name, key):
+        payload = self.client.get(self._entry_key(cache_name, key))
+        if payload is None:
+            return None
+        try:
+            value, stored_at = self.loads(payload)
+        except ValueError:
+            return None
+        return value, stored_at
+
+    def set(self, cache_name, key, value, stored_at, expire):
+        entry_key = self._entry_key(cache_name, key)
+        payload = self.dumps((value, stored_at))
+        pipe = self.client.pipeline()
+        if expire is not None:
+            pipe.set(entry_key, payload, px=max(1, int((stored_at + expire - time.time()) * 1000)))
+        else:
+            pipe.set(entry_key, payload)
+        pipe.hset(self._index_key(cache_name), entry_key, self.dumps(key))
+        pipe.execute()
+
+    def delete(self, cache_name, key=None):
+        index_key = self._index_key(cache_name)
+        if key is None:
+            entry_keys = list(self.client.hkeys(index_key))
+            if entry_keys:
+                self.client.delete(*entry_keys)
+            self.client.delete(index_key)
+        else:
+            entry_key = self._entry_key(cache_name, key)
+            self.client.delete(entry_key)
+            self.client.hdel(index_key, entry_key)
+
+    def items(self, cache_name):
+        index_key = self._index_key(cache_name)
+        index = self.client.hgetall(index_key)
+        if not index:
+            return
+        entry_keys = list(index)
+        for entry_key, payload in zip(entry_keys, self.client.mget(entry_keys)):
+            if payload is None:
+                # Expired; tidy up the index
+                self.client.hdel(index_key, entry_key)
+                continue
+            try:
+                yield self.loads(index[entry_key]), self.loads(payload)[0]
+            except ValueError:
+                continue
+
+    def keys(self, cache_name):
+        index_key = self._index_key(cache_name)
+        index = self.client.hgetall(index_key)
+        if not index:
+            return
+        entry_keys = list(index)
+        pipe = self.client.pipeline()
+        for entry_key in entry_keys:
+            pipe.exists(entry_key)
+        for entry_key, exists in zip(entry_keys, pipe.execute()):
+            if not exists:
+                # Expired; tidy up the index
+                self.client.hdel(index_key, entry_key)
+                continue
+            try:
+                yield self.loads(index[entry_key])
+            except ValueError:
+                continue
+
+    def _acquire(self, name, token):
+        return bool(self.client.set(f"{self.PREFIX}lock:{name}", token, nx=True, px=LOCK_TIMEOUT * 1000))
+
+    def _release(self, name, token):
+        lock_key = f"{self.PREFIX}lock:{name}"
+        # Only release our own lock; one that timed out may have been taken by someone else
+        held = self.client.get(lock_key)
+        if held is not None and (held.decode() if isinstance(held, bytes) else held) == token:
+            self.client.delete(lock_key)
+
+
+def backend_from_url(url: Optional[str], secret: Optional[str] = None) -> Optional[SharedCacheBackend]:
+    """Backend for a sqlite:///path or redis:// URL, or None for no shared cache. `secret` signs its entries."""
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):], secret)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend.from_url(url, secret)
+    raise ValueError(f"Unsupported cache backend URL: {url}")
+
+
+def backend_from_env() -> Optional[SharedCacheBackend]:
+    return backend_from_url(os.environ.get("SUPPORT_REPORTS_CACHE_BACKEND"), os.environ.get("SUPPORT_REPORTS_CACHE_SECRET"))
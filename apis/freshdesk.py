@@ -1,20 +1,76 @@
 import requests
 import datetime
+import logging
+import threading
+import time
 import streamlit as st
-from typing import List, Dict, Optional
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Optional, Tuple
 from urllib.parse import quote
 
+from apis.cache import CACHES, entity_cache, budget_from_env
+from apis.records import Ticket, TimeEntry, MIN_TIMESTAMP, parse_description
+from apis.ticket_query import TicketQuery, SEARCH_PAGE_SIZE, SEARCH_MAX_RESULTS, parse_api_datetime, format_api_datetime
+from stores.companies import CompanyIndex
+from stores.descriptions import DescriptionStore
+from stores.time_entry_store import calendar_month, open_time_entry_store
+from stores.ticket_ranges import TicketRangeCache
+
+logger = logging.getLogger(__name__)
+
 BASE_URL = st.secrets["base_url"]
 API_KEY = st.secrets["api_key"]
 
+# Freshdesk won't page through a ticket listing beyond this page
+LIST_MAX_PAGES = 300
+# Saturated windows are split until they are this small
+MIN_TICKET_WINDOW = datetime.timedelta(hours=1)
+# Parallel requests when fetching partitioned ticket windows
+FETCH_WORKERS = 8
+# Listings leave out the description, which is by far the largest part of a ticket
+LIST_INCLUDE = 'stats,requester'
+# Memory budget for descriptions loaded on demand
+DESCRIPTION_STORE_BYTES = 64 * 1024 * 1024
+# Up to this many missing descriptions are fetched ticket by ticket; more are listed in bulk, company by company
+DESCRIPTION_SINGLE_FETCH_LIMIT = 20
+# Lists past their one-hour TTL are served stale and refreshed in the background for up to this long
+MAX_STALE = 3 * 3600
+# A throttled (429) or failed (5xx) request is retried this many times, waiting as Retry-After
+# says or else RETRY_BACKOFF seconds doubling with each attempt, but never more than RETRY_MAX_WAIT
+MAX_RETRIES = 5
+RETRY_BACKOFF = 1.0
+RETRY_MAX_WAIT = 60.0
+
+def retry_delay(response: requests.Response, attempt: int) -> float:
+    """Seconds to wait before retrying a throttled or failed request."""
+    try:
+        delay = float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        delay = RETRY_BACKOFF * 2 ** attempt
+    return min(max(delay, 0.0), RETRY_MAX_WAIT)
+
 class FreshdeskAPI:
     def __init__(self, base_url: str, api_key: str):
         self.base_url = base_url
         self.api_key = api_key
+        # Range caches for ticket listings, one per (per_page, include, company_id) combination
+        self._ticket_ranges = {}
+        self._ticket_ranges_lock = threading.Lock()
+        self._descriptions = DescriptionStore(DESCRIPTION_STORE_BYTES)
+        # (companies list, index built from it)
+        self._company_index = (None, None)
+        self._time_entry_store = open_time_entry_store()
 
     def _get(self, url: str) -> requests.Response:
-        """Base GET request with authentication."""
-        response = requests.get(url, auth=(self.api_key, 'X'))
+        """Base GET request with authentication, retried with backoff while Freshdesk throttles or fails."""
+        for attempt in range(MAX_RETRIES + 1):
+            response = requests.get(url, auth=(self.api_key, 'X'))
+            if (response.status_code != 429 and response.status_code < 500) or attempt == MAX_RETRIES:
+                break
+            delay = retry_delay(response, attempt)
+            logger.warning("Freshdesk answered %s for %s; retrying in %.0f s", response.status_code, url, delay)
+            time.sleep(delay)
         response.raise_for_status()
         return response
 
@@ -33,29 +89,42 @@ class FreshdeskAPI:
             else:
                 url = None
 
-    @st.cache_resource(ttl=3600)
-    def get_companies(_self) -> List[Dict]:
-        url = f"{_self.base_url}/companies"
+    @entity_cache("companies", budget_from_env("companies", 4), ttl=3600, max_stale=MAX_STALE)
+    def get_companies(self) -> List[Dict]:
+        url = f"{self.base_url}/companies"
         results = []
-        for page_data in _self._get_paginated(url):
+        for page_data in self._get_paginated(url):
             results.extend(page_data)
         return results
 
-    @st.cache_resource(ttl=3600)
-    def get_company_by_id(_self, company_id: int) -> Optional[Dict]:
-        url = f"{_self.base_url}/companies/{company_id}"
-        resp = _self._get(url)
+    @entity_cache("company_details", budget_from_env("company_details", 1), ttl=3600, namespace="companies")
+    def get_company_by_id(self, company_id: int) -> Optional[Dict]:
+        url = f"{self.base_url}/companies/{company_id}"
+        resp = self._get(url)
         return resp.json()
 
+    def get_company_index(self) -> CompanyIndex:
+        """Companies indexed by ID, company code and name, rebuilt whenever the companies list is refreshed."""
+        companies = self.get_companies()
+        indexed, index = self._company_index
+        if indexed is not companies:
+            index = CompanyIndex(companies)
+            self._company_index = (companies, index)
+        return index
+
+    def get_company_id(self, company_code: str) -> Optional[int]:
+        """Look up a company's ID from its company code."""
+        company = self.get_company_index().by_code(company_code)
+        return company.id if company else None
+
     def get_companies_options(self) -> Dict[str, int]:
-        companies_data = self.get_companies()
-        return {c['name']: c['id'] for c in companies_data}
+        return {c.name: c.id for c in self.get_company_index()}
 
-    @st.cache_resource(ttl=3600)
-    def get_products(_self) -> List[Dict]:
-        url = f"{_self.base_url}/products"
+    @entity_cache("products", budget_from_env("products", 1), ttl=3600, namespace="directories")
+    def get_products(self) -> List[Dict]:
+        url = f"{self.base_url}/products"
         results = []
-        for page_data in _self._get_paginated(url):
+        for page_data in self._get_paginated(url):
             results.extend(page_data)
         return results
 
@@ -63,9 +132,17 @@ class FreshdeskAPI:
         products = self.get_products()
         return {p['id']: p['name'] for p in products}
 
-    @st.cache_resource(ttl=3600)
-    def get_time_entries(_self, start_date: Optional[str]=None, end_date: Optional[str]=None, company_id: Optional[int]=None, ticket_id: Optional[int]=None) -> List[Dict]:
+    @entity_cache("time_entries", budget_from_env("time_entries", 64), ttl=3600, max_stale=MAX_STALE, namespace="time entries")
+    def get_time_entries(self, start_date: Optional[str]=None, end_date: Optional[str]=None, company_id: Optional[int]=None, ticket_id: Optional[int]=None) -> List[TimeEntry]:
         # start_date and end_date are expected as YYYY-MM-DD strings
+        # A closed month is final, so it comes from the local store without asking Freshdesk
+        month = calendar_month(start_date, end_date)
+        if ticket_id is None and month and self._time_entry_store.is_closed(month):
+            return self._time_entry_store.month_entries(month, company_id)
+        return self.list_time_entries(start_date, end_date, company_id, ticket_id)
+
+    def list_time_entries(self, start_date: Optional[str]=None, end_date: Optional[str]=None, company_id: Optional[int]=None, ticket_id: Optional[int]=None) -> List[TimeEntry]:
+        """Time entries straight from Freshdesk, bypassing the caches and the local store (see get_time_entries)."""
         # Build query params
         params = []
         
@@ -78,56 +155,405 @@ class FreshdeskAPI:
             
         # The FreshDesk API handles ticket-specific time entries differently
         if ticket_id is not None:
-            url = f"{_self.base_url}/tickets/{ticket_id}/time_entries"
+            url = f"{self.base_url}/tickets/{ticket_id}/time_entries"
         else:
-            url = f"{_self.base_url}/time_entries"
+            url = f"{self.base_url}/time_entries"
             
         # Add query parameters if we have any
         if params:
             url += f"?{'&'.join(params)}"
 
         results = []
-        for page_data in _self._get_paginated(url):
-            results.extend(page_data)
+        for page_data in self._get_paginated(url):
+            results.extend(TimeEntry.from_api(entry) for entry in page_data)
         return results
 
-    @st.cache_resource(ttl=3600)
-    def get_tickets(_self, updated_since: Optional[str]=None, per_page=100, order_by='updated_at', order_type='desc', include='stats,requester,description') -> List[Dict]:
-        """Get tickets updated since a certain date."""
+    def get_tickets(self, updated_since: Optional[str]=None, per_page=100, order_by='updated_at', order_type='desc', include=LIST_INCLUDE, company_id: Optional[int]=None) -> List[Ticket]:
+        """Get tickets updated since a certain date, optionally for a single company."""
         if updated_since is None:
             # Default: last 90 days
-            date = datetime.datetime.now() - datetime.timedelta(days=90)
-            date_utc = date.astimezone(datetime.timezone.utc)
-            updated_since = date_utc.strftime('%Y-%m-%dT%H:%M:%SZ')
-        url = f"{_self.base_url}/tickets/?per_page={per_page}&order_by={order_by}&order_type={order_type}&include={include}&updated_since={updated_since}"
+            start = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=90)
+        else:
+            start = parse_api_datetime(updated_since)
 
-        results = []
-        for page_data in _self._get_paginated(url):
-            results.extend(page_data)
+        results = self.get_tickets_in_range(start, per_page=per_page, include=include, company_id=company_id)
+        results.sort(key=lambda t: getattr(t, order_by) or MIN_TIMESTAMP, reverse=(order_type == 'desc'))
         return results
 
-    @st.cache_resource(ttl=3600)
-    def get_ticket_data(_self, ticket_id: int) -> Dict:
-        url = f"{_self.base_url}/tickets/{ticket_id}"
-        resp = _self._get(url)
-        return resp.json()
+    def get_tickets_in_range(self, start: datetime.datetime, end: Optional[datetime.datetime]=None, per_page=100, include=LIST_INCLUDE, company_id: Optional[int]=None) -> List[Ticket]:
+        """
+        Get tickets updated in [start, end) (up to now if no end is given).
+
+        With a company_id, only that company's tickets are requested from Freshdesk.
+
+        Served from a range cache, so only the parts of the range that haven't been
+        fetched within the last hour are requested from Freshdesk. Parts fetched
+        up to MAX_STALE ago are served as they are and refetched in the background.
+        """
+        if end is None:
+            end = datetime.datetime.now(datetime.timezone.utc)
+        cache_key = (per_page, include, company_id)
+        with self._ticket_ranges_lock:
+            if cache_key not in self._ticket_ranges:
+                self._ticket_ranges[cache_key] = TicketRangeCache(
+                    lambda range_start, range_end: self.get_tickets_partitioned(range_start, range_end, per_page=per_page, include=include, company_id=company_id),
+                    ttl=3600,
+                    max_stale=MAX_STALE,
+                )
+            range_cache = self._ticket_ranges[cache_key]
+        return range_cache.get(start, end)
+
+    def get_tickets_partitioned(self, start: datetime.datetime, end: datetime.datetime, per_page=100, include=LIST_INCLUDE, company_id: Optional[int]=None) -> List[Ticket]:
+        """
+        Get tickets updated in [start, end), fetching date windows in parallel.
+
+        The range is split into day windows (week windows for ranges over two weeks).
+        A window that runs into the list endpoint's page cap is split in half and
+        refetched, so wide ranges are never silently truncated. Results are
+        deduplicated by ticket ID, keeping the most recently updated copy.
+
+        A single company's tickets are few enough to start with one window.
+        """
+        if company_id is not None:
+            window = end - start
+        elif end - start <= datetime.timedelta(days=14):
+            window = datetime.timedelta(days=1)
+        else:
+            window = datetime.timedelta(days=7)
+        windows = []
+        window_start = start
+        while window_start < end:
+            windows.append((window_start, min(window_start + window, end)))
+            window_start += window
+
+        tickets_by_id = {}
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            pending = {
+                pool.submit(self._get_ticket_window, ws, we, per_page, include, company_id): (ws, we)
+                for ws, we in windows
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    ws, we = pending.pop(future)
+                    tickets, complete = future.result()
+                    if not complete:
+                        if we - ws > MIN_TICKET_WINDOW:
+                            middle = ws + (we - ws) / 2
+                            for half in ((ws, middle), (middle, we)):
+                                pending[pool.submit(self._get_ticket_window, *half, per_page, include, company_id)] = half
+                            continue
+                        logger.warning("Ticket window %s to %s hit the page cap and may be incomplete", ws, we)
+                    for ticket in tickets:
+                        known = tickets_by_id.get(ticket.id)
+                        if known is None or (ticket.updated_at or MIN_TIMESTAMP) > (known.updated_at or MIN_TIMESTAMP):
+                            tickets_by_id[ticket.id] = ticket
+        return list(tickets_by_id.values())
+
+    def _get_ticket_window(self, start: datetime.datetime, end: datetime.datetime, per_page: int, include: str, company_id: Optional[int]=None):
+        """
+        List tickets updated in [start, end), oldest first.
+
+        Returns:
+            tuple: (tickets, complete) where complete is False if the page cap was
+            reached before the end of the window.
+        """
+        url = f"{self.base_url}/tickets/?per_page={per_page}&order_by=updated_at&order_type=asc&include={include}&updated_since={format_api_datetime(start)}"
+        if company_id is not None:
+            url += f"&company_id={company_id}"
+        tickets = []
+        for page_number, page_data in enumerate(self._get_paginated(url), start=1):
+            for raw_ticket in page_data:
+                ticket = self._ingest_ticket(raw_ticket)
+                if (ticket.updated_at or MIN_TIMESTAMP) >= end:
+                    return tickets, True
+                tickets.append(ticket)
+            if page_number >= LIST_MAX_PAGES:
+                return tickets, False
+        return tickets, True
+
+    @entity_cache("searches", budget_from_env("searches", 16), ttl=3600, namespace="tickets")
+    def search_tickets(self, query: str) -> Dict:
+        """
+        Run a ticket filter query (https://developers.freshdesk.com/api/#filter_tickets).
+
+        Returns {"total": n, "results": [Ticket, ...]}, with the results cached as
+        records rather than raw responses. If more tickets match than the search
+        endpoint will page through, "results" is None and only the total is returned.
+        """
+        encoded_query = quote(f'"{query}"')
+        results, total = [], 0
+        for page in range(1, SEARCH_MAX_RESULTS // SEARCH_PAGE_SIZE + 1):
+            data = self._get(f"{self.base_url}/search/tickets?query={encoded_query}&page={page}").json()
+            total = data.get("total", 0)
+            if total > SEARCH_MAX_RESULTS:
+                return {"total": total, "results": None}
+            page_results = data.get("results", [])
+            results.extend(self._ingest_ticket(raw_ticket) for raw_ticket in page_results)
+            if not page_results or len(results) >= total:
+                break
+        return {"total": total, "results": results}
+
+    @entity_cache("ticket_queries", budget_from_env("ticket_queries", 32), ttl=3600, namespace="tickets")
+    def find_tickets(self, ticket_query: TicketQuery) -> List[Ticket]:
+        """
+        Get tickets matching a TicketQuery.
+
+        Single-company queries list only that company's tickets. Otherwise as much
+        of the query as possible is sent to the search endpoint so only matching
+        tickets are downloaded. Queries that are too broad for search fall
+        back to the cached ticket listing for the date range, filtered locally.
+        """
+        if len(ticket_query.company_ids) == 1:
+            # A single company's tickets can be listed directly without touching anyone else's
+            tickets = self._get_tickets_for_query(ticket_query, company_id=ticket_query.company_ids[0])
+            keep = ticket_query.local_filter(pushed=("company_ids",))
+            return [t for t in tickets if keep(t)]
+
+        query, pushed = ticket_query.search_query()
+        if query:
+            found = self.search_tickets(query)
+            if found["results"] is not None:
+                keep = ticket_query.local_filter(pushed)
+                return [t for t in found["results"] if keep(t)]
+        tickets = self._get_tickets_for_query(ticket_query)
+        keep = ticket_query.local_filter()
+        return [t for t in tickets if keep(t)]
+
+    def _get_tickets_for_query(self, ticket_query: TicketQuery, company_id: Optional[int]=None) -> List[Ticket]:
+        """List tickets for a query's date range (the last 90 days if it has no start date)."""
+        if ticket_query.start_date:
+            start = parse_api_datetime(ticket_query.start_date)
+        else:
+            start = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=90)
+        end = parse_api_datetime(ticket_query.end_date) + datetime.timedelta(days=1) if ticket_query.end_date else None
+        return self.get_tickets_in_range(start, end, company_id=company_id)
+
+    def _ingest_ticket(self, raw_ticket: Dict) -> Ticket:
+        """Turn a ticket response into a record, keeping its description in the description store if it has one."""
+        ticket = Ticket.from_api(raw_ticket)
+        description = parse_description(raw_ticket)
+        if description is not None:
+            self._descriptions.put(ticket.id, ticket.updated_at, description)
+        return ticket
+
+    def get_descriptions(self, tickets: List[Ticket]) -> Dict[int, str]:
+        """
+        Plain-text descriptions for tickets, loaded on demand.
+
+        Descriptions already in the store are returned as they are. A few missing
+        ones are fetched ticket by ticket. Otherwise each company's missing
+        tickets are listed with descriptions included, over the updated-at range
+        they span for that company only; tickets without a company are fetched
+        one by one. Each listing is read back before the next one can push it
+        out of the store.
+
+        Returns:
+            dict: {ticket_id: description}. Tickets whose description couldn't be
+            loaded are left out.
+        """
+        descriptions, missing = self._descriptions.get_many(tickets)
+        if not missing:
+            return descriptions
+        by_company = defaultdict(list)
+        for ticket in missing:
+            by_company[ticket.company_id].append(ticket)
+        if len(missing) <= DESCRIPTION_SINGLE_FETCH_LIMIT:
+            singles, listed = missing, {}
+        else:
+            singles, listed = by_company.pop(None, []), by_company
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            for ticket, description in zip(singles, pool.map(self._fetch_description, singles)):
+                if description is not None:
+                    descriptions[ticket.id] = description
+        for company_id, company_tickets in listed.items():
+            start = min(t.updated_at or MIN_TIMESTAMP for t in company_tickets)
+            end = max(t.updated_at or MIN_TIMESTAMP for t in company_tickets) + datetime.timedelta(seconds=1)
+            self.get_tickets_partitioned(start, end, include='description', company_id=company_id)
+            found, _ = self._descriptions.get_many(company_tickets)
+            descriptions.update(found)
+        return descriptions
+
+    def _fetch_description(self, ticket: Ticket) -> Optional[str]:
+        """Fetch one ticket's description, or None if the ticket can't be loaded."""
+        try:
+            raw_ticket = self._get(f"{self.base_url}/tickets/{ticket.id}").json()
+        except requests.RequestException as e:
+            logger.warning("Could not load the description of ticket #%s: %s", ticket.id, e)
+            return None
+        self._ingest_ticket(raw_ticket)
+        return parse_description(raw_ticket)
+
+    def refresh_ticket(self, ticket_id: int) -> Ticket:
+        """
+        Refetch one changed ticket and update every cache that holds it.
+
+        The ticket entry, its description and its copy in the ticket listings are
+        replaced in place. Search results can't tell whether the change moves the
+        ticket in or out of a query, so those are dropped.
+        """
+        ticket = self._ingest_ticket(self._get(f"{self.base_url}/tickets/{ticket_id}").json())
+        self.get_ticket_data.cache.put((ticket_id,), ticket)
+        with self._ticket_ranges_lock:
+            range_caches = list(self._ticket_ranges.items())
+        for (_, _, company_id), range_cache in range_caches:
+            if company_id is None or company_id == ticket.company_id:
+                range_cache.update(ticket)
+            else:
+                # The ticket may have just moved away from this company
+                range_cache.discard(ticket_id)
+        self.search_tickets.cache.invalidate()
+        self.find_tickets.cache.invalidate()
+        return ticket
+
+    def forget_ticket(self, ticket_id: int):
+        """Remove a deleted ticket from every cache."""
+        self.get_ticket_data.cache.invalidate((ticket_id,))
+        self._descriptions.discard(ticket_id)
+        with self._ticket_ranges_lock:
+            range_caches = list(self._ticket_ranges.values())
+        for range_cache in range_caches:
+            range_cache.discard(ticket_id)
+        self.search_tickets.cache.invalidate()
+        self.find_tickets.cache.invalidate()
+
+    def invalidate_time_entries(self, ticket_id: int, executed_at: Optional[str]=None, company_id: Optional[int]=None) -> int:
+        """
+        Drop the cached time entry lists a changed time entry could appear in.
+
+        Args:
+            ticket_id: The ticket the time entry is logged against.
+            executed_at: The entry's YYYY-MM-DD date, if known. Without it every
+                date range is dropped for the company.
+            company_id: The ticket's company, looked up from the ticket if not given.
+
+        Returns:
+            int: The number of cached lists dropped.
+        """
+        if company_id is None:
+            company_id = self.get_ticket_data(ticket_id).company_id
+        if executed_at is not None:
+            # Keeps the month open until it has been fully synced again
+            self._time_entry_store.mark_changed(executed_at[:7])
+
+        def affected(key):
+            start_date, end_date, entry_company_id, entry_ticket_id = key
+            if entry_ticket_id is not None:
+                return entry_ticket_id == ticket_id
+            if entry_company_id is not None and entry_company_id != company_id:
+                return False
+            if executed_at is None:
+                return True
+            return (start_date is None or start_date <= executed_at) and (end_date is None or executed_at <= end_date)
+
+        return self.get_time_entries.cache.invalidate_keys_where(affected)
+
+    def cache_parts(self) -> List[Tuple[str, str, object]]:
+        """
+        Every cache this client fills, for the cache console.
+
+        Each part has `len()`, `size_bytes` and `invalidate()`; entity caches and
+        ticket listings also have `oldest_age()`.
+
+        Returns:
+            list: (namespace, name, cache) tuples.
+        """
+        parts = [(cache.namespace, name, cache) for name, cache in CACHES.items()]
+        with self._ticket_ranges_lock:
+            range_caches = list(self._ticket_ranges.items())
+        for (per_page, include, company_id), range_cache in range_caches:
+            label = f"ticket listing ({include})" if company_id is None else f"ticket listing ({include}, company {company_id})"
+            parts.append(("tickets", label, range_cache))
+        parts.append(("tickets", "descriptions", self._descriptions))
+        return parts
+
+    def invalidate_namespace(self, namespace: str):
+        """Drop everything cached in one namespace."""
+        for part_namespace, _, cache in self.cache_parts():
+            if part_namespace == namespace:
+                cache.invalidate()
+
+    def invalidate_company(self, company_id: int) -> int:
+        """
+        Drop what's cached for one company: its tickets and ticket listings, the
+        time entry lists that include its time, and queries that could return its
+        tickets. Listings shared by all companies are left alone; clearing the
+        tickets namespace refetches those.
+
+        Returns:
+            int: The number of cached entries and listings dropped.
+        """
+        ticket_ids = set()
+
+        def company_ticket(_, ticket):
+            if ticket.company_id == company_id:
+                ticket_ids.add(ticket.id)
+                return True
+            return False
+
+        dropped = self.get_ticket_data.cache.invalidate_where(company_ticket)
+        dropped += self.get_time_entries.cache.invalidate_keys_where(
+            lambda key: key[3] in ticket_ids if key[3] is not None else key[2] in (None, company_id)
+        )
+        dropped += self.find_tickets.cache.invalidate_keys_where(lambda key: company_id in key[0].company_ids or not key[0].company_ids)
+        dropped += self.search_tickets.cache.invalidate_where(
+            lambda _, found: found["results"] is None or any(t.company_id == company_id for t in found["results"])
+        )
+        dropped += self.get_company_by_id.cache.invalidate_keys_where(lambda key: key[0] == company_id)
+        with self._ticket_ranges_lock:
+            range_caches = list(self._ticket_ranges.items())
+        for (_, _, range_company_id), range_cache in range_caches:
+            if range_company_id == company_id:
+                range_cache.invalidate()
+                dropped += 1
+        return dropped
+
+    def invalidate_ticket(self, ticket_id: int) -> Optional[Ticket]:
+        """
+        Refetch one ticket everywhere it is cached and drop its time entry list.
+
+        Returns:
+            Ticket: The fresh ticket, or None if it no longer exists.
+        """
+        self.get_time_entries.cache.invalidate_keys_where(lambda key: key[3] == ticket_id)
+        try:
+            return self.refresh_ticket(ticket_id)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 404:
+                raise
+            self.forget_ticket(ticket_id)
+            return None
+
+    @entity_cache("tickets", budget_from_env("tickets", 32), ttl=3600, namespace="tickets")
+    def get_ticket_data(self, ticket_id: int) -> Ticket:
+        url = f"{self.base_url}/tickets/{ticket_id}"
+        resp = self._get(url)
+        return self._ingest_ticket(resp.json())
+
+    def find_ticket_data(self, ticket_id: int) -> Optional[Ticket]:
+        """get_ticket_data(), or None (logged) if the ticket can't be fetched, e.g. because it was deleted."""
+        try:
+            return self.get_ticket_data(ticket_id)
+        except requests.RequestException as e:
+            logger.warning("Could not fetch ticket #%s: %s", ticket_id, e)
+            return None
 
-    @st.cache_resource(ttl=3600*24*7)
-    def get_agent(_self, agent_id: int) -> Dict:
-        url = f"{_self.base_url}/agents/{agent_id}"
-        resp = _self._get(url)
+    @entity_cache("agents", budget_from_env("agents", 4), ttl=3600*24*7, namespace="directories")
+    def get_agent(self, agent_id: int) -> Dict:
+        url = f"{self.base_url}/agents/{agent_id}"
+        resp = self._get(url)
         return resp.json()
 
-    @st.cache_resource(ttl=3600*24*7)
-    def get_group(_self, group_id: int) -> Dict:
-        url = f"{_self.base_url}/groups/{group_id}"
-        resp = _self._get(url)
+    @entity_cache("groups", budget_from_env("groups", 1), ttl=3600*24*7, namespace="directories")
+    def get_group(self, group_id: int) -> Dict:
+        url = f"{self.base_url}/groups/{group_id}"
+        resp = self._get(url)
         return resp.json()
 
-    @st.cache_resource(ttl=3600*24*7)
-    def get_requester(_self, requester_id: int) -> Dict:
-        url = f"{_self.base_url}/contacts/{requester_id}"
-        resp = _self._get(url)
+    @entity_cache("requesters", budget_from_env("requesters", 8), ttl=3600*24*7, namespace="directories")
+    def get_requester(self, requester_id: int) -> Dict:
+        url = f"{self.base_url}/contacts/{requester_id}"
+        resp = self._get(url)
         return resp.json()
 
 # Create a global instance if desired
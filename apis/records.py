@@ -0,0 +1,148 @@
+import datetime
+import html
+import re
+import sys
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from apis.ticket_query import parse_api_datetime
+
+# Sorts before every real timestamp, for records with a missing one
+MIN_TIMESTAMP = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+
+TAG_RE = re.compile(r"<[^>]+>")
+
+# Shared instances of the IDs and value tuples that repeat across tickets
+# (status, product, group, agent, company, categories, ...). Both stay small.
+_interned_ids: Dict[int, int] = {}
+_interned_values: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def intern_id(value: Optional[int]) -> Optional[int]:
+    """Return a shared instance of a repeated ID so tickets don't each hold a copy."""
+    if value is None:
+        return None
+    return _interned_ids.setdefault(value, value)
+
+
+def intern_values(values: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Return a shared instance of a tuple of interned strings."""
+    values = tuple(sys.intern(v) for v in values)
+    return _interned_values.setdefault(values, values)
+
+
+def html_to_text(value: Optional[str]) -> str:
+    """Strip tags and entities from a ticket description."""
+    if not value:
+        return ""
+    return html.unescape(TAG_RE.sub(" ", value))
+
+
+def parse_description(ticket: Dict) -> Optional[str]:
+    """The plain-text description of a ticket response, or None if it wasn't included."""
+    if ticket.get('description_text') is not None:
+        return ticket['description_text']
+    if ticket.get('description') is not None:
+        return html_to_text(ticket['description'])
+    return None
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime.datetime]:
+    """Parse a Freshdesk timestamp, or None if it's missing or malformed."""
+    if not value:
+        return None
+    try:
+        return parse_api_datetime(value)
+    except ValueError:
+        return None
+
+
+def parse_estimate(value) -> float:
+    """Read an `estimate_hrs` custom field value as a number of hours."""
+    if value and isinstance(value, str) and value.replace('.', '', 1).isdigit():
+        return float(value)
+    return 0.0
+
+
+def as_values(value) -> Tuple[str, ...]:
+    """Normalise a custom field value (scalar, list, tuple or None) to a shared tuple of strings."""
+    if value is None or value == "":
+        return ()
+    if isinstance(value, (list, tuple)):
+        return intern_values(tuple(str(v) for v in value))
+    return intern_values((str(value),))
+
+
+@dataclass(frozen=True, slots=True)
+class Ticket:
+    """
+    A Freshdesk ticket, normalised once when it is fetched.
+
+    Timestamps are aware UTC datetimes, the estimate is a float and multi-value
+    custom fields are tuples. Only the fields the app reads are kept, and
+    repeated IDs and values are shared between tickets, so large ticket sets
+    stay small in the caches. Descriptions live in a separate DescriptionStore.
+    """
+    id: int
+    subject: str
+    status: Optional[int]
+    company_id: Optional[int]
+    company_name: Optional[str]
+    requester_id: Optional[int]
+    responder_id: Optional[int]
+    group_id: Optional[int]
+    product_id: Optional[int]
+    created_at: Optional[datetime.datetime]
+    updated_at: Optional[datetime.datetime]
+    estimate: float
+    change_request: bool
+    billing_statuses: Tuple[str, ...]
+    ticket_types: Tuple[str, ...]
+    categories: Tuple[str, ...]
+    contract_hourly_rate: Optional[float] = None
+
+    @classmethod
+    def from_api(cls, ticket: Dict) -> "Ticket":
+        custom_fields = ticket.get('custom_fields') or {}
+        company_name = ticket.get('company_name')
+        return cls(
+            id=ticket['id'],
+            subject=ticket.get('subject') or '',
+            status=intern_id(ticket.get('status')),
+            company_id=intern_id(ticket.get('company_id')),
+            company_name=sys.intern(company_name) if company_name else company_name,
+            requester_id=ticket.get('requester_id'),
+            responder_id=intern_id(ticket.get('responder_id')),
+            group_id=intern_id(ticket.get('group_id')),
+            product_id=intern_id(ticket.get('product_id')),
+            created_at=parse_timestamp(ticket.get('created_at')),
+            updated_at=parse_timestamp(ticket.get('updated_at')),
+            estimate=parse_estimate(custom_fields.get('estimate_hrs')),
+            change_request=bool(custom_fields.get('change_request', False)),
+            billing_statuses=as_values(custom_fields.get('billing_status')),
+            ticket_types=as_values(custom_fields.get('cf_type')),
+            categories=as_values(custom_fields.get('category')),
+            contract_hourly_rate=custom_fields.get('contract_hourly_rate'),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class TimeEntry:
+    """A Freshdesk time entry, normalised once when it is fetched."""
+    ticket_id: Optional[int]
+    billable: bool
+    time_spent_in_seconds: int
+    executed_at: Optional[datetime.datetime]
+
+    @property
+    def hours(self) -> float:
+        return self.time_spent_in_seconds / 3600.0
+
+    @classmethod
+    def from_api(cls, entry: Dict) -> "TimeEntry":
+        return cls(
+            ticket_id=entry.get('ticket_id'),
+            billable=bool(entry.get('billable', False)),
+            time_spent_in_seconds=int(entry.get('time_spent_in_seconds') or 0),
+            executed_at=parse_timestamp(entry.get('executed_at')),
+        )
@@ -0,0 +1,102 @@
+import datetime
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+# Freshdesk's /search/tickets endpoint returns at most 10 pages of 30 results
+SEARCH_PAGE_SIZE = 30
+SEARCH_MAX_RESULTS = 300
+# Longest query string the search endpoint accepts
+MAX_QUERY_LENGTH = 512
+
+
+def parse_api_datetime(value: str) -> datetime.datetime:
+    """Parse a YYYY-MM-DD or ISO 8601 timestamp from/for the API as an aware UTC datetime."""
+    parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.astimezone(datetime.timezone.utc)
+
+
+def format_api_datetime(value: datetime.datetime) -> str:
+    """Format a datetime the way Freshdesk writes timestamps (UTC, second precision)."""
+    return value.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+@dataclass(frozen=True)
+class TicketQuery:
+    """
+    Filter state for a ticket fetch.
+
+    Dates are YYYY-MM-DD strings and both ends are inclusive. Empty tuples don't
+    filter. The query is frozen so it can be used as a cache key.
+    """
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    company_ids: Tuple[int, ...] = ()
+    statuses: Tuple[int, ...] = ()
+    group_ids: Tuple[int, ...] = ()
+    agent_ids: Tuple[int, ...] = ()
+
+    def _clauses(self) -> List[Tuple[str, str]]:
+        """(predicate name, search clause) for every predicate the search API can express."""
+        clauses = []
+        if self.start_date:
+            clauses.append(("start_date", f"updated_at:>'{self.start_date}'"))
+        if self.end_date:
+            clauses.append(("end_date", f"updated_at:<'{self.end_date}'"))
+        for name, field, values in [
+            ("statuses", "status", self.statuses),
+            ("group_ids", "group_id", self.group_ids),
+            ("agent_ids", "agent_id", self.agent_ids),
+        ]:
+            if values:
+                clause = " OR ".join(f"{field}:{int(v)}" for v in values)
+                clauses.append((name, f"({clause})" if len(values) > 1 else clause))
+        return clauses
+
+    def search_query(self) -> Tuple[Optional[str], Tuple[str, ...]]:
+        """
+        Build a Freshdesk /search/tickets query for this filter state.
+
+        Predicates the search API can't express (company) or that would push the
+        query over the length limit are left out.
+
+        Returns:
+            tuple: (query string or None if nothing can be pushed down,
+                    names of the predicates the query covers)
+        """
+        parts, pushed = [], []
+        for name, clause in self._clauses():
+            candidate = " AND ".join(parts + [clause])
+            # The query is sent wrapped in double quotes
+            if len(candidate) + 2 > MAX_QUERY_LENGTH:
+                continue
+            parts.append(clause)
+            pushed.append(name)
+        if not parts:
+            return None, ()
+        return " AND ".join(parts), tuple(pushed)
+
+    def local_filter(self, pushed: Tuple[str, ...] = ()) -> Callable[["Ticket"], bool]:
+        """
+        Predicate over Ticket records applying every filter not already covered by `pushed`.
+
+        Args:
+            pushed: Predicate names already applied by the API (see `search_query`).
+        """
+        checks = []
+        if self.start_date and "start_date" not in pushed:
+            start = datetime.date.fromisoformat(self.start_date)
+            checks.append(lambda t: t.updated_at is not None and t.updated_at.date() >= start)
+        if self.end_date and "end_date" not in pushed:
+            end = datetime.date.fromisoformat(self.end_date)
+            checks.append(lambda t: t.updated_at is not None and t.updated_at.date() <= end)
+        if self.company_ids and "company_ids" not in pushed:
+            checks.append(lambda t: t.company_id in self.company_ids)
+        if self.statuses and "statuses" not in pushed:
+            checks.append(lambda t: t.status in self.statuses)
+        if self.group_ids and "group_ids" not in pushed:
+            checks.append(lambda t: t.group_id in self.group_ids)
+        if self.agent_ids and "agent_ids" not in pushed:
+            checks.append(lambda t: t.responder_id in self.agent_ids)
+        return lambda ticket: all(check(ticket) for check in checks)
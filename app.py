@@ -7,11 +7,20 @@ from views.ticket_finder import display_ticket_finder
 from views.supportbot import display_supportbot
 from views.sandbox import display_sandbox_view
 from views.watchlists import display_watchlists
+from views.cache_console import display_cache_console
+from views.client_overview import display_client_overview
+from workers.cache_warmer import start_cache_warmer
+from workers.webhooks import start_webhook_server
 from auth import login, hash_client_code, validate_query_param_login
 
 # Configure Streamlit
 st.set_page_config(page_title="Made Media Support Reporter", page_icon="🧮", layout="wide")
 
+# Keep this and last month's data warm in the background (once per server process)
+start_cache_warmer()
+# Apply Freshdesk change events to the caches as they happen (needs the webhook_secret secret)
+start_webhook_server()
+
 # Session state initialization
 if "logged_in" not in st.session_state:
     st.session_state.logged_in = False
@@ -28,7 +37,7 @@ if not st.session_state.logged_in and "login_token" in query_params:
 # Authentication and session handling
 if not st.session_state.logged_in:
     # Handle login
-    username, client_code = login(st.secrets["gcp_service_account"])
+    username, client_code = login()
     if username and client_code:
         st.session_state.username = username
         st.session_state.client_code = client_code
@@ -79,6 +88,14 @@ if st.session_state.logged_in:
         st.title("Watchlists")
         display_watchlists(st.session_state.client_code, filters_container)
 
+    def client_overview():
+        st.title("Client overview")
+        display_client_overview(st.session_state.client_code)
+
+    def cache_console():
+        st.title("Caches")
+        display_cache_console(st.session_state.client_code)
+
     # Page navigation configuration
     pages = [
         st.Page(monthly_report, title="Monthly hours", icon="🧮"),
@@ -86,9 +103,11 @@ if st.session_state.logged_in:
     ]
 
     if st.session_state.client_code == "admin":
+        pages.append(st.Page(client_overview, title="Client overview", icon="📋"))
         pages.append(st.Page(watchlists, title="Watchlists", icon="👁️"))
         pages.append(st.Page(xero_export, title="Xero export", icon="💸"))
         pages.append(st.Page(supportbot, title="Support bot", icon="🤖"))
+        pages.append(st.Page(cache_console, title="Caches", icon="🗄️"))
         # pages.append(st.Page(sandbox, title="Spreadsheet explorer", icon="📊"))
 
     # Navigation
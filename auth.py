@@ -1,28 +1,31 @@
 import streamlit as st
 from apis.google import setup_google_sheets, fetch_auth_data
+from stores.credentials import open_credential_store
 import hashlib
 
 SHEET_ID = "11RbGbkxKeIqrjweIClMh2a14hwt1-wWP0tKkAI7gvIQ"
 SHEET_NAME = "Clients"
 
-def authenticate_user(username, password, auth_data):
+@st.cache_resource
+def get_credential_store():
+    """Shared credential index, refreshed from the Clients sheet in the background."""
+    def load_clients_sheet():
+        client = setup_google_sheets(st.secrets["gcp_service_account"])
+        return fetch_auth_data(client, SHEET_ID, SHEET_NAME)
+    return open_credential_store(load_clients_sheet)
+
+def authenticate_user(username, password, credential_store):
     """Check if the username and password match."""
-    for record in auth_data:
-        if record['Username'] == username and record['Password'] == password:
-            return record['Client code']
-    return None
+    return credential_store.authenticate(username, password)
 
-def login(secrets):
+def login():
     """Display login form and return credentials if valid."""
     st.header("Login")
     username = st.text_input("Username")
     password = st.text_input("Password", type="password")
 
     if st.button("Login"):
-        client = setup_google_sheets(secrets)
-        auth_data = fetch_auth_data(client, SHEET_ID, SHEET_NAME)
-
-        client_code = authenticate_user(username, password, auth_data)
+        client_code = authenticate_user(username, password, get_credential_store())
         if client_code:
             return username, client_code
         else:
@@ -45,7 +48,5 @@ def validate_query_param_login(query_params, secret_key):
     return None
 
 def fetch_all_client_codes():
-    """Fetch all valid client codes from the Google Sheet."""
-    client = setup_google_sheets(st.secrets["gcp_service_account"])
-    auth_data = fetch_auth_data(client, SHEET_ID, SHEET_NAME)
-    return [record["Client code"] for record in auth_data]
\ No newline at end of file
+    """Fetch all valid client codes from the credential index."""
+    return get_credential_store().client_codes()
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+Per-ticket memory footprint of cached raw Freshdesk JSON versus Ticket/TimeEntry records.
+
+Generates synthetic listing responses shaped like `/tickets?include=stats,requester,description`
+and `/time_entries`, then measures how much memory stays allocated for the parsed JSON and for
+the records built from it.
+
+Run from the repository root:
+
+    python -m benchmarks.record_memory --tickets 20000
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from apis.records import Ticket, TimeEntry
+
+STATUSES = [2, 3, 4, 5, 6, 8, 12]
+CATEGORIES = ["Bug", "Content", "Hosting", "Integration", "Training", "Feature"]
+TYPES = ["Question", "Incident", "Problem", "Change"]
+BILLING_STATUSES = [None, "Free", "90 days", "Invoice", "Contract"]
+
+
+def fake_ticket(ticket_id: int, rng: random.Random) -> dict:
+    """A ticket as returned by the listing endpoint with stats, requester and description."""
+    body = " ".join(rng.choice(["the", "box", "office", "page", "error", "booking", "login", "event"]) for _ in range(250))
+    stamp = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00Z"
+    requester_id = rng.randint(10**10, 10**11)
+    return {
+        "cc_emails": [], "fwd_emails": [], "reply_cc_emails": [], "ticket_cc_emails": [],
+        "fr_escalated": False, "spam": False, "email_config_id": 1, "priority": rng.randint(1, 4),
+        "group_id": rng.choice([None] + [48000000000 + i for i in range(8)]),
+        "requester_id": requester_id,
+        "responder_id": rng.choice([None] + [48000100000 + i for i in range(25)]),
+        "source": 2, "company_id": 48000200000 + rng.randint(0, 60), "status": rng.choice(STATUSES),
+        "subject": f"Ticket {ticket_id}: problem with the booking page",
+        "association_type": None, "support_email": None, "to_emails": None,
+        "product_id": rng.choice([None] + [48000300000 + i for i in range(6)]),
+        "id": ticket_id, "type": rng.choice(TYPES), "due_by": stamp, "fr_due_by": stamp,
+        "is_escalated": False,
+        "custom_fields": {
+            "category": rng.sample(CATEGORIES, rng.randint(0, 2)),
+            "cf_type": rng.choice(TYPES),
+            "billing_status": rng.choice(BILLING_STATUSES),
+            "estimate_hrs": rng.choice([None, "2", "4.5", "8"]),
+            "change_request": rng.random() < 0.2,
+            "contract_hourly_rate": None,
+            "cf_environment": "Production", "cf_url": None, "cf_browser": None,
+        },
+        "created_at": stamp, "updated_at": stamp, "associated_tickets_count": None, "tags": [],
+        "description": f"<div><p>{body}</p></div>",
+        "description_text": body,
+        "requester": {"id": requester_id, "name": "A Requester", "email": "someone@example.com", "mobile": None, "phone": None},
+        "stats": {
+            "agent_responded_at": stamp, "requester_responded_at": stamp, "first_responded_at": stamp,
+            "status_updated_at": stamp, "reopened_at": None, "resolved_at": None, "closed_at": None, "pending_since": None,
+        },
+    }
+
+
+def fake_time_entry(entry_id: int, ticket_id: int, rng: random.Random) -> dict:
+    stamp = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T10:00:00Z"
+    return {
+        "id": entry_id, "billable": rng.random() < 0.7, "note": "", "timer_running": False,
+        "agent_id": 48000100000 + rng.randint(0, 24), "ticket_id": ticket_id, "company_id": 48000200000,
+        "time_spent": "01:30", "time_spent_in_seconds": rng.randint(60, 20000),
+        "executed_at": stamp, "start_time": stamp, "created_at": stamp, "updated_at": stamp,
+    }
+
+
+def retained_bytes(build):
+    """Bytes still allocated after `build()` returns, with the result kept alive."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tickets", type=int, default=10000)
+    parser.add_argument("--entries-per-ticket", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    tickets_payload = json.dumps([fake_ticket(i, rng) for i in range(args.tickets)])
+    entries_payload = json.dumps([
+        fake_time_entry(i * args.entries_per_ticket + j, i, rng)
+        for i in range(args.tickets) for j in range(args.entries_per_ticket)
+    ])
+    entry_count = args.tickets * args.entries_per_ticket
+
+    raw_tickets, raw_ticket_bytes = retained_bytes(lambda: json.loads(tickets_payload))
+    del raw_tickets
+    ticket_records, ticket_record_bytes = retained_bytes(lambda: [Ticket.from_api(t) for t in json.loads(tickets_payload)])
+    del ticket_records
+    raw_entries, raw_entry_bytes = retained_bytes(lambda: json.loads(entries_payload))
+    del raw_entries
+    entry_records, entry_record_bytes = retained_bytes(lambda: [TimeEntry.from_api(e) for e in json.loads(entries_payload)])
+    del entry_records
+
+    print(f"{'':<14}{'raw JSON':>12}{'records':>12}{'saving':>9}")
+    for label, count, raw_bytes, record_bytes in [
+        ("per ticket", args.tickets, raw_ticket_bytes, ticket_record_bytes),
+        ("per entry", entry_count, raw_entry_bytes, entry_record_bytes),
+    ]:
+        print(f"{label:<14}{raw_bytes / count:>10.0f} B{record_bytes / count:>10.0f} B{1 - record_bytes / raw_bytes:>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
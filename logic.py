@@ -1,3 +1,5 @@
+import pandas as pd
+
 status_mapping = {
     2: "Open",
     3: "Pending",
@@ -20,29 +22,52 @@ status_mapping = {
     20: "20"
 }
 
+# Products billed through their own subscription, so support time on them isn't billed by the hour
+SAAS_PRODUCTS = ["BlocksOffice", "MonkeyWrench"]
+# Tickets with one of these billing statuses are never billed against the contract. A ticket
+# with several billing statuses is billed as usual, whatever they are.
+UNBILLABLE_BILLING_STATUSES = ["Free", "90 days", "Invoice"]
+
 
 def calculate_billable_time(time_entry, ticket_data, time_hours, product_options):
     # given a time entry, let's figure out how much time should actually be billed
     
     # here's the data we need:
-    product_id = ticket_data.get("product_id")
+    product_id = ticket_data.product_id
     product_name = product_options.get(product_id, "Unknown product")
-    change_request = ticket_data["custom_fields"].get("change_request", False)
-    time_spent = time_entry["time_spent_in_seconds"] / 3600
-    billing_status = ticket_data["custom_fields"].get("billing_status")
+    change_request = ticket_data.change_request
+    time_spent = time_entry.hours
+    billing_statuses = ticket_data.billing_statuses
 
-    # configurations:
-    saas_products = ["BlocksOffice", "MonkeyWrench"]
-    unbillable_billing_statuses = ["Free", "90 days", "Invoice"]
-    
     # determine billable status:
-    if billing_status in unbillable_billing_statuses:
+    if len(billing_statuses) == 1 and billing_statuses[0] in UNBILLABLE_BILLING_STATUSES:
         return 0
     elif change_request:
         return time_spent
-    elif product_name in saas_products:
+    elif product_name in SAAS_PRODUCTS:
         return 0
-    elif time_entry["billable"]:
+    elif time_entry.billable:
         return time_spent
     else:
-        return 0
\ No newline at end of file
+        return 0
+
+
+def calculate_billable_hours(entries: pd.DataFrame) -> pd.Series:
+    """
+    The rules of calculate_billable_time applied to a whole frame of time entries at once.
+
+    Args:
+        entries (pd.DataFrame): One row per time entry, with a unique index and
+            hours, billable, product_name, change_request and billing_statuses
+            (tuples) columns.
+
+    Returns:
+        pd.Series: Billable hours per entry, aligned with `entries`.
+    """
+    statuses = entries["billing_statuses"]
+    unbillable_status = (statuses.str.len() == 1) & statuses.str[0].isin(UNBILLABLE_BILLING_STATUSES)
+    billed = ~unbillable_status & (
+        entries["change_request"]
+        | (entries["billable"] & ~entries["product_name"].isin(SAAS_PRODUCTS))
+    )
+    return entries["hours"].where(billed, 0.0)
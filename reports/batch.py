@@ -0,0 +1,215 @@
+"""
+Write every client's Monthly report to files without the app, e.g. at month end.
+
+Run from the repository root, so the app's secrets are found:
+
+    python -m reports.batch --month 2026-09 --format csv html
+    python -m reports.batch --month 2026-09 --clients ACME BETA --format pdf --out ~/reports
+
+Clients are reported in parallel worker processes. They share the entity
+caches through SUPPORT_REPORTS_CACHE_BACKEND, or through a SQLite file in the
+data directory if it isn't set. The month's time entries and tickets are
+fetched once up front, so every worker reads them from that cache instead of
+fetching them again. PDF output needs the weasyprint package.
+"""
+import argparse
+import datetime
+import html
+import multiprocessing
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import pandas as pd
+import streamlit as st
+from dateutil.relativedelta import relativedelta
+
+from apis.cache import use_shared_backend
+from apis.cache_backends import backend_from_env
+from apis.freshdesk import freshdesk_api, FETCH_WORKERS
+from apis.google import setup_google_sheets
+from apis.records import TimeEntry
+from reports.monthly import ticket_details, time_summary, tickets_table
+from stores.companies import CompanyRecord
+from utils import data_path, month_bounds, get_support_contract_data
+
+FORMATS = ("csv", "html", "pdf")
+
+# Google Sheets client of this worker process
+_google_client = None
+
+
+def client_report(company: CompanyRecord, start_date: str, time_entries: List[TimeEntry]):
+    """
+    One client's Monthly report, as on the Monthly hours page.
+
+    Returns:
+        tuple: (summary dict from time_summary(), ticket table from tickets_table())
+    """
+    global _google_client
+    if _google_client is None:
+        _google_client = setup_google_sheets(st.secrets["gcp_service_account"])
+
+    details = ticket_details(time_entries, freshdesk_api.get_product_options())
+    tickets_details_df = pd.DataFrame(details)
+    support_data = get_support_contract_data(_google_client, company.code, datetime.datetime.strptime(start_date, "%Y-%m-%d"))
+    return time_summary(tickets_details_df, company, support_data, start_date), tickets_table(tickets_details_df)
+
+
+def report_html(company: CompanyRecord, month_name: str, summary: Dict, table: pd.DataFrame) -> str:
+    """A standalone HTML page with the report's figures and ticket table."""
+    currency_symbol = company.currency_symbol
+    figures = {
+        "Total hours tracked": f"{summary['total_hours']:.1f} h",
+        "Billable hours": f"{summary['billable_hours']:.1f} h",
+    }
+    if summary["show_billing"]:
+        figures["Rollover hours"] = f"{summary['carryover_hours']:.1f} h"
+        figures["Billable overage"] = f"{summary['overage_hours']:.1f} h"
+        figures["Estimated cost"] = f"{currency_symbol}{summary['estimated_cost']:,.2f}"
+
+    notes = ""
+    if summary["invoice_ticket_ids"]:
+        ticket_list = ", ".join(f"#{ticket_id}" for ticket_id in summary["invoice_ticket_ids"])
+        notes = (
+            f"<p>Tickets marked 'Invoice' ({ticket_list}) have {summary['invoice_hours']:.1f} hours "
+            f"tracked this month not included in the above totals.</p>"
+        )
+
+    title = html.escape(f"Support hours usage for {month_name} – {company.name}")
+    rows = "".join(f"<tr><th>{html.escape(label)}</th><td>{html.escape(value)}</td></tr>" for label, value in figures.items())
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; margin-bottom: 1.5em; }}
+th, td {{ border: 1px solid #ccc; padding: 0.3em 0.6em; text-align: left; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<table>{rows}</table>
+{notes}
+<p>Made Media support tickets with time tracked during {html.escape(month_name)} for {html.escape(company.name)}</p>
+{table.to_html(index=False, float_format=lambda value: f"{value:.1f}", render_links=True)}
+</body>
+</html>
+"""
+
+
+def write_client_report(company: CompanyRecord, start_date: str, time_entries: List[TimeEntry], formats: List[str], out_dir: str) -> List[str]:
+    """Build one client's report and write it in each format. Runs in a worker process."""
+    summary, table = client_report(company, start_date, time_entries)
+    month_name = datetime.datetime.strptime(start_date, "%Y-%m-%d").strftime("%B %Y")
+    base_path = os.path.join(out_dir, f"{company.code}-{start_date[:7]}")
+
+    paths = []
+    if "csv" in formats:
+        table.to_csv(f"{base_path}.csv", index=False)
+        paths.append(f"{base_path}.csv")
+    if "html" in formats or "pdf" in formats:
+        page = report_html(company, month_name, summary, table)
+        if "html" in formats:
+            with open(f"{base_path}.html", "w", encoding="utf-8") as f:
+                f.write(page)
+            paths.append(f"{base_path}.html")
+        if "pdf" in formats:
+            try:
+                import weasyprint
+            except ImportError:
+                raise ImportError("PDF reports need the weasyprint package (pip install weasyprint)")
+            weasyprint.HTML(string=page).write_pdf(f"{base_path}.pdf")
+            paths.append(f"{base_path}.pdf")
+    return paths
+
+
+def entries_by_company(start_date: str, end_date: str) -> Dict[int, List[TimeEntry]]:
+    """
+    The month's time entries for every company, fetched in one listing.
+
+    Fetching each entry's ticket groups them by company and leaves the tickets
+    in the shared cache for the workers. Entries on tickets that can't be
+    fetched are left out (and the tickets logged), so the other reports are
+    still written.
+    """
+    entries = [entry for entry in freshdesk_api.get_time_entries(start_date, end_date) if entry.ticket_id]
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        tickets = {ticket.id: ticket for ticket in pool.map(freshdesk_api.find_ticket_data, {entry.ticket_id for entry in entries}) if ticket}
+    by_company = defaultdict(list)
+    for entry in entries:
+        if entry.ticket_id in tickets:
+            by_company[tickets[entry.ticket_id].company_id].append(entry)
+    return by_company
+
+
+def run_batch(month: str, client_codes: Optional[List[str]], formats: List[str], out_dir: str, workers: int) -> int:
+    """
+    Write the reports of several clients for a YYYY-MM month in parallel.
+
+    Returns:
+        int: How many clients failed.
+    """
+    start_date, end_date = month_bounds(datetime.datetime.strptime(month, "%Y-%m").date())
+    company_index = freshdesk_api.get_company_index()
+    if client_codes:
+        unknown = [code for code in client_codes if company_index.by_code(code) is None]
+        if unknown:
+            raise SystemExit(f"Unknown client codes: {', '.join(unknown)}")
+        companies = [company_index.by_code(code) for code in client_codes]
+    else:
+        companies = [company for company in company_index if company.code]
+
+    started = time.time()
+    by_company = entries_by_company(start_date, end_date)
+    print(f"Fetched {sum(map(len, by_company.values()))} time entries for {month} in {time.time() - started:.0f} s")
+
+    os.makedirs(out_dir, exist_ok=True)
+    failures = 0
+    # Spawned rather than forked, so no worker inherits another process's cache connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {}
+        for company in companies:
+            if not by_company.get(company.id):
+                print(f"{company.code}: no time tracked in {month}; skipped")
+                continue
+            futures[pool.submit(write_client_report, company, start_date, by_company[company.id], formats, out_dir)] = company
+        for future in as_completed(futures):
+            company = futures[future]
+            try:
+                paths = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"{company.code}: failed: {e}")
+                continue
+            print(f"{company.code}: wrote {', '.join(paths)}")
+    print(f"Wrote {len(futures) - failures} reports for {month} in {time.time() - started:.0f} s")
+    return failures
+
+
+def main():
+    last_month = (datetime.date.today().replace(day=1) - relativedelta(months=1)).strftime("%Y-%m")
+    parser = argparse.ArgumentParser(description="Write clients' Monthly reports to files.")
+    parser.add_argument("--month", default=last_month, help="Month to report on as YYYY-MM (default: last month)")
+    parser.add_argument("--clients", nargs="+", metavar="CODE", help="Company codes to report on (default: every client with a code)")
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=["csv"], dest="formats", help="Output formats (default: csv)")
+    parser.add_argument("--out", help="Output folder (default: reports/YYYY-MM in the data directory)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    # Share the caches with the workers, which read the backend from the environment when they start
+    if not os.environ.get("SUPPORT_REPORTS_CACHE_BACKEND"):
+        os.environ["SUPPORT_REPORTS_CACHE_BACKEND"] = f"sqlite:///{os.path.abspath(data_path('reports', 'cache.db'))}"
+    use_shared_backend(backend_from_env())
+
+    out_dir = args.out or os.path.dirname(data_path("reports", args.month, "index"))
+    sys.exit(1 if run_batch(args.month, args.clients, args.formats, out_dir, args.workers) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import datetime
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from apis.freshdesk import FreshdeskAPI, freshdesk_api
+from apis.records import TimeEntry
+from logic import calculate_billable_time
+from stores.companies import CompanyRecord
+from stores.ticket_table import TICKET_URL
+
+# Ticket detail columns shown in the report table, with their headings
+TABLE_COLUMNS = {
+    "ticket_url": "Ticket",
+    "title": "Title",
+    "time_spent_this_month": "Time tracked this month",
+    "billable_time_this_month": "Billable time this month",
+    "total_time_spent": "Total time tracked",
+    "total_billable_time": "Total billable time",
+    "estimate": "Estimate (h)",
+    "requester_name": "Filed by",
+    "agent_name": "Assigned to",
+    "group_name": "Group",
+    "product_name": "Product",
+    "ticket_type": "Type",
+    "change_request": "CR?",
+}
+
+
+def ticket_details(
+    time_entries: List[TimeEntry],
+    product_options: Dict[int, str],
+    api: FreshdeskAPI = freshdesk_api,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    on_warning: Callable[[str], None] = print,
+) -> List[Dict]:
+    """
+    Per-ticket details for a month's time entries: time and billable time this
+    month and overall, plus the ticket's requester, agent, group, product and
+    custom fields.
+
+    Args:
+        time_entries: The month's time entries for one company.
+        product_options: Mapping of product ID to name.
+        on_progress: Called with (entries processed, total entries) as entries are processed.
+        on_warning: Called with a message when a ticket's overall time can't be fetched.
+
+    Returns:
+        list: One dict per ticket. Multi-value fields are tuples, so every value is hashable.
+    """
+    # Make sure all default values are hashable
+    details = defaultdict(lambda: {
+        'time_spent_this_month': 0.0,
+        'billable_time_this_month': 0.0,
+        'total_time_spent': 0.0,
+        'total_billable_time': 0.0,
+        'ticket_id': None,
+        'title': None,
+        'requester_name': "Unknown",
+        'product_name': "Unknown",
+        'billing_status': "Unknown",
+        'estimate': 0.0,
+        'ticket_type': "Unknown",
+        'group_name': "Unknown",
+        'agent_name': "Unknown",
+        # Make sure change_request is present and hashable
+        'change_request': False
+    })
+
+    for i, entry in enumerate(time_entries):
+        if on_progress:
+            on_progress(i, len(time_entries))
+
+        ticket_id = entry.ticket_id
+        if not ticket_id:
+            continue
+
+        # Get ticket data
+        ticket_data = api.get_ticket_data(ticket_id)
+        requester_name = "Unknown"
+        if ticket_data.requester_id:
+            requester = api.get_requester(ticket_data.requester_id)
+            requester_name = requester.get('name', 'Unknown')
+
+        # Get agent and group information
+        agent_name = "Unassigned"
+        if ticket_data.responder_id:
+            agent = api.get_agent(ticket_data.responder_id)
+            agent_name = agent.get('contact', {}).get('name', 'Unknown')
+
+        group_name = "None"
+        if ticket_data.group_id:
+            group = api.get_group(ticket_data.group_id)
+            group_name = group.get('name', 'Unknown')
+
+        product_name = product_options.get(ticket_data.product_id, "Unknown")
+
+        # Aggregate time spent
+        time_hours = entry.hours
+        billable_hours = calculate_billable_time(entry, ticket_data, time_hours, product_options)
+
+        # Update the details for the ticket
+        ticket_detail = details[ticket_id]
+        ticket_detail['time_spent_this_month'] += time_hours
+        ticket_detail['billable_time_this_month'] += billable_hours
+        ticket_detail['ticket_id'] = ticket_id
+        ticket_detail['title'] = ticket_data.subject or 'No subject'
+        ticket_detail['requester_name'] = requester_name
+        ticket_detail['product_name'] = product_name
+
+        ticket_detail['billing_status'] = ticket_data.billing_statuses or ('Unknown',)
+        ticket_detail['change_request'] = ticket_data.change_request
+        ticket_detail['estimate'] = ticket_data.estimate
+        ticket_detail['ticket_type'] = ticket_data.ticket_types or ('Unknown',)
+
+        ticket_detail['group_name'] = group_name
+        ticket_detail['agent_name'] = agent_name
+
+        # Get the total time spent on this ticket (all time, not just this month)
+        try:
+            all_time_entries = api.get_time_entries(ticket_id=ticket_id)
+            total_time = sum(entry.hours for entry in all_time_entries)
+            total_billable = sum(calculate_billable_time(entry, ticket_data, entry.hours, product_options) for entry in all_time_entries)
+            ticket_detail['total_time_spent'] = total_time
+            ticket_detail['total_billable_time'] = total_billable
+        except Exception as e:
+            # If there's an error fetching total time, just use the current month's time
+            on_warning(f"Could not fetch total time for ticket #{ticket_id}: {str(e)}")
+            ticket_detail['total_time_spent'] = ticket_detail['time_spent_this_month']
+            ticket_detail['total_billable_time'] = ticket_detail['billable_time_this_month']
+
+    if on_progress:
+        on_progress(len(time_entries), len(time_entries))
+    return list(details.values())
+
+
+def time_summary(tickets_details_df: pd.DataFrame, company: CompanyRecord, support_data: Dict, start_date: str, today: Optional[datetime.date] = None) -> Dict:
+    """
+    A month's usage against the support contract.
+
+    Args:
+        tickets_details_df: The month's ticket_details() as a DataFrame.
+        company: The client.
+        support_data: get_support_contract_data() for the month. If it has an
+            error, the company's inclusive hours in Freshdesk are used with no carryover.
+        start_date: The month's first day as a YYYY-MM-DD string.
+
+    Returns:
+        dict: total_hours, billable_hours, inclusive_hours, carryover_hours,
+        overage_hours, hourly_rate and estimated_cost, plus show_billing (rollover,
+        overage and cost are only shown for this month and the adjacent ones,
+        and cost is 0 otherwise), invoice_ticket_ids and invoice_hours (time on
+        tickets marked "Invoice", which isn't in the billable total).
+    """
+    total_time = tickets_details_df['time_spent_this_month'].sum()
+    billable_time = tickets_details_df['billable_time_this_month'].sum()
+
+    # Use data from the spreadsheet if available, otherwise fall back to company data
+    carryover_value = support_data.get('carryover_hours', 0) if 'error' not in support_data else 0
+    inclusive_hours = support_data.get('inclusive_hours') if 'error' not in support_data else company.inclusive_hours
+    if inclusive_hours is None:
+        inclusive_hours = company.inclusive_hours
+    carryover = float(carryover_value) if carryover_value else 0
+    inclusive_hours = float(inclusive_hours) if inclusive_hours else 0
+
+    today = today or datetime.date.today()
+    start_date_year, start_date_month = map(int, start_date.split("-")[:2])
+    show_billing = (today.year == start_date_year and abs(today.month - start_date_month) <= 1)
+
+    # Calculate billable hours after considering contract and rollover
+    overage_hours = max(0, billable_time - inclusive_hours - carryover)
+    hourly_rate = company.hourly_rate or 0
+
+    # Handle both string "Invoice" and tuple with "Invoice" in it
+    invoice_tickets = tickets_details_df[
+        tickets_details_df["billing_status"].apply(
+            lambda x: x == "Invoice" or
+                      (isinstance(x, tuple) and "Invoice" in x)
+        )
+    ]
+
+    return {
+        "total_hours": total_time,
+        "billable_hours": billable_time,
+        "inclusive_hours": inclusive_hours,
+        "carryover_hours": carryover,
+        "overage_hours": overage_hours,
+        "hourly_rate": hourly_rate,
+        "estimated_cost": overage_hours * hourly_rate if show_billing else 0.0,
+        "show_billing": show_billing,
+        "invoice_ticket_ids": invoice_tickets["ticket_id"].tolist(),
+        "invoice_hours": invoice_tickets["time_spent_this_month"].sum(),
+    }
+
+
+def tickets_table(tickets_details_df: pd.DataFrame) -> pd.DataFrame:
+    """The report's ticket table: TABLE_COLUMNS with their headings, multi-value fields joined into strings."""
+    table = tickets_details_df.copy()
+    table["ticket_url"] = table["ticket_id"].apply(TICKET_URL.format)
+    for col in ["ticket_type", "billing_status"]:
+        if col in table.columns:
+            table[col] = table[col].apply(
+                lambda x: ", ".join(str(i) for i in x) if isinstance(x, tuple) else x
+            )
+    return table[list(TABLE_COLUMNS)].rename(columns=TABLE_COLUMNS)
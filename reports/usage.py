@@ -0,0 +1,155 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow.compute as pc
+
+from apis.freshdesk import FreshdeskAPI, freshdesk_api, FETCH_WORKERS
+from logic import calculate_billable_hours
+from stores.companies import CompanyRecord
+from stores.time_entry_store import TimeEntryStore, open_time_entry_store
+from utils import month_bounds, get_support_contract_data
+
+USAGE_COLUMNS = ["hours", "billable_hours"]
+
+
+def time_entry_frame(months: List[datetime.date], company_id: Optional[int] = None, api: FreshdeskAPI = freshdesk_api, store: Optional[TimeEntryStore] = None) -> pd.DataFrame:
+    """
+    Time entries for several months, with their billable hours and ticket fields.
+
+    Closed months are read from the local time entry store in one query, with
+    the billable hours and ticket fields stored when they were synced. Each
+    open month is requested on its own, in parallel, so it shares its cache
+    entry with the single-month report. Their tickets are then fetched once
+    each across all months.
+
+    Args:
+        months: Any day in each month to fetch.
+        company_id: Only this company's entries; all companies if not given.
+
+    Returns:
+        pd.DataFrame: One row per time entry with month (YYYY-MM), ticket_id,
+        company_id, hours, billable, billable_hours, product_name and
+        ticket_type columns.
+    """
+    store = store or open_time_entry_store()
+    closed = [month for month in months if store.is_closed(month.strftime("%Y-%m"))]
+    stored = stored_entry_frame(store, closed, company_id) if closed else None
+    months = [month for month in months if month not in closed]
+    if not months:
+        return stored
+
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        per_month = list(pool.map(lambda month: api.get_time_entries(*month_bounds(month), company_id), months))
+        entries = [
+            (month.strftime("%Y-%m"), entry)
+            for month, month_entries in zip(months, per_month)
+            for entry in month_entries
+            if entry.ticket_id
+        ]
+        ticket_ids = {entry.ticket_id for _, entry in entries}
+        # A ticket that can't be fetched (e.g. deleted) keeps its entries, unbilled and without ticket fields, as in the store
+        tickets = [ticket for ticket in pool.map(api.find_ticket_data, ticket_ids) if ticket]
+
+    product_options = api.get_product_options()
+    entry_frame = pd.DataFrame({
+        "month": [month for month, _ in entries],
+        "ticket_id": pd.Series([entry.ticket_id for _, entry in entries], dtype="int64"),
+        "hours": pd.Series([entry.hours for _, entry in entries], dtype="float64"),
+        "billable": pd.Series([entry.billable for _, entry in entries], dtype="bool"),
+    })
+    ticket_frame = pd.DataFrame({
+        "ticket_id": pd.Series([ticket.id for ticket in tickets], dtype="int64"),
+        "company_id": pd.Series([ticket.company_id for ticket in tickets], dtype="Int64"),
+        "product_name": [product_options.get(ticket.product_id, "Unknown") for ticket in tickets],
+        "ticket_type": [", ".join(ticket.ticket_types) or "Unknown" for ticket in tickets],
+        "change_request": pd.Series([ticket.change_request for ticket in tickets], dtype="bool"),
+        "billing_statuses": pd.Series([ticket.billing_statuses for ticket in tickets], dtype="object"),
+    })
+    frame = entry_frame.merge(ticket_frame, on="ticket_id", how="left")
+    fetched = frame["ticket_id"].isin(ticket_frame["ticket_id"])
+    frame[["product_name", "ticket_type"]] = frame[["product_name", "ticket_type"]].fillna("Unknown")
+    frame["change_request"] = frame["change_request"].fillna(False).astype("bool")
+    frame["billable_hours"] = calculate_billable_hours(frame).where(fetched, 0.0)
+    frame = frame.drop(columns=["change_request", "billing_statuses"])
+    if stored is not None:
+        frame = pd.concat([stored, frame[stored.columns]], ignore_index=True)
+    return frame
+
+
+def stored_entry_frame(store: TimeEntryStore, months: List[datetime.date], company_id: Optional[int] = None) -> pd.DataFrame:
+    """Synced months' time entries from the local store, with the same columns as time_entry_frame()."""
+    labels = [month.strftime("%Y-%m") for month in months]
+    entries = store.entries(min(labels), max(labels), company_id).to_pandas()
+    entries = entries[entries["month"].isin(labels) & entries["ticket_id"].notna() & (entries["ticket_id"] != 0)]
+    tickets = store.tickets()
+    ticket_types = pd.Series(
+        pc.binary_join(tickets["ticket_types"], ", ").to_pandas().values,
+        index=tickets["ticket_id"].to_pandas(),
+    )
+    ticket_type = entries["ticket_id"].map(ticket_types).fillna("")
+    return pd.DataFrame({
+        "month": entries["month"],
+        "ticket_id": entries["ticket_id"].astype("int64"),
+        "hours": entries["hours"].astype("float64"),
+        "billable": entries["billable"].astype("bool"),
+        "company_id": entries["company_id"].astype("Int64"),
+        "product_name": entries["product_name"].fillna("Unknown"),
+        "ticket_type": ticket_type.mask(ticket_type == "", "Unknown"),
+        "billable_hours": entries["billable_hours"].astype("float64"),
+    }).reset_index(drop=True)
+
+
+def contract_hours(google_client, company: CompanyRecord, month: datetime.date) -> Tuple[float, float]:
+    """
+    A company's inclusive and carryover hours for a month.
+
+    Read from the support contract spreadsheet, falling back to the company's
+    inclusive hours in Freshdesk and no carryover, as on the Monthly report.
+
+    Returns:
+        tuple: (inclusive_hours, carryover_hours)
+    """
+    support_data = {"error": "No company code"}
+    if company.code:
+        support_data = get_support_contract_data(google_client, company.code, datetime.datetime(month.year, month.month, 1))
+    if 'error' in support_data:
+        inclusive_hours, carryover_hours = None, 0
+    else:
+        inclusive_hours, carryover_hours = support_data.get('inclusive_hours'), support_data.get('carryover_hours', 0)
+    if inclusive_hours is None:
+        inclusive_hours = company.inclusive_hours
+    return float(inclusive_hours or 0), float(carryover_hours or 0)
+
+
+def client_overview(entries: pd.DataFrame, companies: Iterable[CompanyRecord], contracts: pd.DataFrame) -> pd.DataFrame:
+    """
+    Billable hours, overage and estimated cost for every client in one table.
+
+    Args:
+        entries: A time_entry_frame() covering one month, for all companies.
+        companies: The companies to include.
+        contracts: inclusive_hours and carryover_hours indexed by company ID.
+
+    Returns:
+        pd.DataFrame: One row per company that tracked time or has contract
+        hours, with name, code, currency_symbol, hourly_rate, hours,
+        billable_hours, inclusive_hours, carryover_hours, overage_hours and
+        estimated_cost columns, largest overage first.
+    """
+    company_frame = pd.DataFrame(
+        [(c.id, c.name, c.code, c.currency_symbol, c.hourly_rate) for c in companies],
+        columns=["company_id", "name", "code", "currency_symbol", "hourly_rate"],
+    ).set_index("company_id")
+    usage = entries.groupby("company_id")[USAGE_COLUMNS].sum()
+    usage.index = usage.index.astype("int64")
+
+    overview = company_frame.join(usage).join(contracts)
+    overview[USAGE_COLUMNS + ["inclusive_hours", "carryover_hours"]] = overview[USAGE_COLUMNS + ["inclusive_hours", "carryover_hours"]].fillna(0.0)
+    overview["hourly_rate"] = overview["hourly_rate"].astype("float64").fillna(0.0)
+    overview = overview[(overview["hours"] > 0) | (overview["inclusive_hours"] > 0)]
+
+    overview["overage_hours"] = (overview["billable_hours"] - overview["inclusive_hours"] - overview["carryover_hours"]).clip(lower=0)
+    overview["estimated_cost"] = overview["overage_hours"] * overview["hourly_rate"]
+    return overview.sort_values(["overage_hours", "billable_hours"], ascending=False)
@@ -0,0 +1,359 @@
+"""
+The Xero invoice export: one line per ticket with billable time in a month,
+plus contract and rollover lines for each client.
+
+Run headless from the repository root, so the app's secrets are found:
+
+    python -m reports.xero --month 2026-09 --out upload_me_to_xero.csv
+    python -m reports.xero --month 2026-07 --through 2026-09 --out upload_me_to_xero.csv
+
+The CSV is the same, byte for byte, as the one the Xero export page offers.
+A range of months gives one CSV with each month's invoices in turn.
+"""
+import argparse
+import datetime
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, IO, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+from dateutil.relativedelta import relativedelta
+
+from apis.freshdesk import FreshdeskAPI, freshdesk_api, FETCH_WORKERS
+from apis.google import setup_google_sheets
+from apis.records import Ticket, TimeEntry
+from logic import calculate_billable_time
+from utils import month_bounds, get_support_contract_data
+
+# Columns Xero expects, in order
+XERO_COLUMNS = [
+    'ContactName', 'EmailAddress', 'POAddressLine1', 'POAddressLine2',
+    'POAddressLine3', 'POAddressLine4', 'POCity', 'PORegion', 'POPostalCode',
+    'POCountry', 'InvoiceNumber', 'InvoiceDate', 'DueDate', 'Total',
+    'InventoryItemCode', 'Description', 'Quantity', 'UnitAmount', 'Discount',
+    'AccountCode', 'TaxType', 'TaxAmount', 'TrackingName1', 'TrackingOption1',
+    'TrackingName2', 'TrackingOption2', 'Currency'
+]
+
+# Xero columns the export leaves empty or fills with a constant
+EXTRA_COLUMNS = [
+    'EmailAddress', 'POAddressLine1', 'POAddressLine2', 'POAddressLine3',
+    'POAddressLine4', 'POCity', 'PORegion', 'POPostalCode', 'POCountry',
+    'Total', 'InventoryItemCode', 'Discount', 'AccountCode', 'TaxType',
+    'TaxAmount', 'TrackingName1', 'TrackingOption1', 'TrackingName2',
+    'TrackingOption2'
+]
+
+
+def invoice_details(
+    time_entries: List[TimeEntry],
+    products: Dict[int, str],
+    google_client,
+    api: FreshdeskAPI = freshdesk_api,
+    tickets: Optional[Dict[int, Ticket]] = None,
+    month_date: Optional[datetime.datetime] = None,
+) -> Tuple[List[Dict], Dict[str, Dict]]:
+    """
+    Billable time per ticket for a month's time entries, with each client's billing and contract details.
+
+    Args:
+        tickets: The entries' tickets by ID, if already fetched. Otherwise they
+            are fetched up front, in parallel.
+        month_date: The month's first day, for looking up contract data when a
+            client's first entry has no date. The current month if not given.
+
+    Returns:
+        tuple: (one dict per ticket, support contract data by company code)
+    """
+    # Create a dictionary to aggregate time entries by ticket
+    ticket_aggregates = {}
+    company_index = api.get_company_index()
+
+    if tickets is None:
+        tickets = fetch_tickets(time_entries, api)
+
+    # Create a dict to store contract data by company code to avoid multiple lookups
+    contract_data_cache = {}
+
+    for entry in time_entries:
+        ticket_id = entry.ticket_id
+        if not ticket_id:
+            continue
+
+        ticket_data = tickets[ticket_id]
+        company = company_index.by_id(ticket_data.company_id)
+
+        # Fetch company_code, hourly_rate, and currency. The invoices use the
+        # company's raw custom field values, as Xero has always been sent them.
+        custom_fields = company.custom_fields if company else {}
+        company_code = (company.code if company else None) or "—"
+        hourly_rate = custom_fields.get('contract_hourly_rate') or ticket_data.contract_hourly_rate
+        currency = custom_fields.get('currency', 'USD')
+
+        # Get support contract data from spreadsheet
+        if company_code not in contract_data_cache and company_code != "—":
+            # Use the first day of the month from the time entry for contract data lookup
+            time_spent_at = entry.executed_at
+            if time_spent_at:
+                try:
+                    # Get first day of the month
+                    first_day = datetime.datetime(time_spent_at.year, time_spent_at.month, 1)
+                    contract_data_cache[company_code] = get_support_contract_data(google_client, company_code, first_day)
+                except Exception:
+                    contract_data_cache[company_code] = {"error": "Failed to parse date"}
+            else:
+                # Use the exported (or else the current) month if no date in time entry
+                contract_data_cache[company_code] = get_support_contract_data(google_client, company_code, month_date)
+
+        product_name = products.get(ticket_data.product_id, "Unknown")
+        time_hours = entry.hours
+        billable_hours = calculate_billable_time(entry, ticket_data, time_hours, products)
+
+        # Create a key for the ticket
+        ticket_key = str(ticket_id)
+
+        # If we haven't seen this ticket before, create a new entry
+        if ticket_key not in ticket_aggregates:
+            ticket_aggregates[ticket_key] = {
+                'time_spent_this_month': 0,
+                'billable_time_this_month': 0,
+                'ticket_id': ticket_id,
+                'title': ticket_data.subject or 'No subject',
+                'company': ticket_data.company_name or 'Unknown',
+                'company_code': company_code,
+                'hourly_rate': hourly_rate,
+                'currency': currency,
+                'product': product_name,
+                'change_request': ticket_data.change_request,
+                # Add contract data if available
+                'carryover_hours': contract_data_cache.get(company_code, {}).get('carryover_hours', 0)
+                    if company_code != "—" and "error" not in contract_data_cache.get(company_code, {}) else 0,
+                'inclusive_hours': contract_data_cache.get(company_code, {}).get('inclusive_hours')
+                    if company_code != "—" and "error" not in contract_data_cache.get(company_code, {})
+                    else custom_fields.get('inclusive_hours')
+            }
+
+        # Add the hours to the ticket's total
+        ticket_aggregates[ticket_key]['time_spent_this_month'] += time_hours
+        ticket_aggregates[ticket_key]['billable_time_this_month'] += billable_hours
+
+    return list(ticket_aggregates.values()), contract_data_cache
+
+
+def invoice_frame(tickets_details: List[Dict], selected_date: datetime.datetime) -> pd.DataFrame:
+    """
+    The Xero rows for a month's invoice_details(), sorted by invoice number and description.
+
+    Args:
+        tickets_details: invoice_details() for the month. Updated in place with invoice numbers.
+        selected_date: The month's first day.
+
+    Returns:
+        pd.DataFrame: XERO_COLUMNS, one row per ticket plus each client's contract and rollover lines.
+    """
+    # Add invoice numbers
+    for ticket in tickets_details:
+        if ticket['company_code']:
+            ticket['InvoiceNumber'] = f"S-{ticket['company_code']}{selected_date.strftime('%y%-m')}"
+
+    if not tickets_details:
+        return pd.DataFrame(columns=XERO_COLUMNS)
+
+    # Create the initial DataFrame for tickets
+    tickets_details_df = pd.DataFrame(tickets_details)
+    tickets_details_df = tickets_details_df[tickets_details_df['company_code'] != "—"]
+    tickets_details_df = tickets_details_df[tickets_details_df['hourly_rate'].notnull()]
+
+    # Group by company to create additional line items for each company
+    company_groups = tickets_details_df.groupby(['company', 'company_code', 'InvoiceNumber', 'hourly_rate', 'currency'])
+
+    # Create a list to store all rows including the new line items
+    all_rows = []
+
+    # Process each company group
+    for (company, company_code, invoice_number, hourly_rate, currency), group in company_groups:
+        # Add all original ticket rows to our list
+        all_rows.extend(group.to_dict('records'))
+
+        # Get total billable hours for this company
+        total_billable_hours = group['billable_time_this_month'].sum()
+
+        # Get contract data from the first row (should be the same for all rows in this company)
+        first_row = group.iloc[0]
+        carryover_hours = first_row.get('carryover_hours', 0)
+        inclusive_hours = first_row.get('inclusive_hours', 0)
+
+        # Only add extra line items if we have contract or carryover hours
+        if carryover_hours > 0 or inclusive_hours > 0:
+            # Create contract details line item
+            contract_line = {
+                'company': company,
+                'company_code': company_code,
+                'InvoiceNumber': invoice_number,
+                'hourly_rate': hourly_rate,
+                'currency': currency,
+                'billable_time_this_month': 0,  # No quantity for this informational line
+                'ticket_id': "",  # No ticket associated
+                'title': "Support contract details",
+                'product': "Support",
+                'change_request': False,
+                'Description': f"Support contract: {inclusive_hours} hours included monthly"
+            }
+            all_rows.append(contract_line)
+
+            # If we have carryover hours, add a line item with negative quantity
+            if carryover_hours > 0:
+                # Only apply carryover up to the billable amount
+                applied_carryover = min(carryover_hours, total_billable_hours)
+                if applied_carryover > 0:
+                    carryover_line = {
+                        'company': company,
+                        'company_code': company_code,
+                        'InvoiceNumber': invoice_number,
+                        'hourly_rate': hourly_rate,
+                        'currency': currency,
+                        'billable_time_this_month': -applied_carryover,  # Negative quantity for credit
+                        'ticket_id': "",  # No ticket associated
+                        'title': "Rollover credit",
+                        'product': "Support",
+                        'change_request': False,
+                        'Description': f"Credit for {applied_carryover:.1f} rollover hours (total available: {carryover_hours:.1f}h)"
+                    }
+                    all_rows.append(carryover_line)
+
+    if not all_rows:
+        return pd.DataFrame(columns=XERO_COLUMNS)
+
+    # Create new DataFrame with all rows
+    tickets_details_df = pd.DataFrame(all_rows)
+
+    # Map and transform for Xero CSV
+    tickets_details_df['Description'] = tickets_details_df.apply(
+        lambda row: (
+            # For ticket rows, show ticket ID and details
+            (f"{row['ticket_id']} – {row['title']} [{row['product']}]" +
+             (" [Change Request]" if row['change_request'] else ""))
+            if row['ticket_id'] else
+            # For non-ticket rows (contract info and rollover), use the description directly
+            row.get('Description', '')
+        ),
+        axis=1
+    )
+    tickets_details_df = tickets_details_df.rename(columns={
+        'company': 'ContactName',
+        'company_code': 'ContactCode',
+        'hourly_rate': 'UnitAmount',
+        'billable_time_this_month': 'Quantity',
+        'currency': 'Currency'
+    })
+    tickets_details_df['InvoiceDate'] = (selected_date + relativedelta(months=1) - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+    tickets_details_df['DueDate'] = (selected_date + relativedelta(months=2) - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+
+    # Add extra Xero columns
+    for col in EXTRA_COLUMNS:
+        tickets_details_df[col] = None
+
+    tickets_details_df['AccountCode'] = '4010'
+    tickets_details_df['TaxType'] = 'Tax Exempt (0%)'
+
+    tickets_details_df = tickets_details_df.sort_values(by=['InvoiceNumber', 'Description'])
+
+    # Reorder columns to match Xero's expected format
+    return tickets_details_df[XERO_COLUMNS]
+
+
+def csv_chunks(frame: pd.DataFrame, header: bool = True) -> Iterator[str]:
+    """
+    CSV text for an invoice_frame(): the header, then each invoice's rows.
+
+    Chunks are cut from the finished frame rather than formatted on their own,
+    so every value is written the way `frame.to_csv(index=False)` writes it and
+    the chunks join up to exactly that text.
+    """
+    if header:
+        yield frame.iloc[:0].to_csv(index=False)
+    for _, invoice_rows in frame.groupby('InvoiceNumber', sort=False):
+        yield invoice_rows.to_csv(index=False, header=False)
+
+
+def write_csv(frames: List[pd.DataFrame], f: IO[str]):
+    """
+    Write invoice_frame()s to a text file opened with newline="", one invoice at a time.
+
+    Several months are written one after the other under a single header, each
+    formatted as its own export would be.
+    """
+    for i, frame in enumerate(frames):
+        for chunk in csv_chunks(frame, header=i == 0):
+            f.write(chunk)
+
+
+def fetch_tickets(time_entries: List[TimeEntry], api: FreshdeskAPI = freshdesk_api) -> Dict[int, Ticket]:
+    """The tickets of some time entries by ID, fetched in parallel."""
+    ticket_ids = list({entry.ticket_id for entry in time_entries if entry.ticket_id})
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        return dict(zip(ticket_ids, pool.map(api.get_ticket_data, ticket_ids)))
+
+
+def export_months(months: List[datetime.datetime], google_client, api: FreshdeskAPI = freshdesk_api) -> List[Tuple[datetime.datetime, pd.DataFrame, Dict[str, Dict]]]:
+    """
+    The Xero rows for one or more months.
+
+    Every month's time entries are fetched in parallel (closed months come from
+    local storage), then the tickets of all of them at once, so a ticket worked
+    on in several months is fetched once. Contract worksheets are cached per
+    fiscal year, so months of the same year share them. Each month gets its own
+    invoice numbers and its own contract and carryover lookups.
+
+    Args:
+        months: The first day of each month, oldest first.
+
+    Returns:
+        list: (month, invoice_frame(), support contract data by company code) per month.
+    """
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        per_month = list(pool.map(lambda month: api.get_time_entries(*month_bounds(month)), months))
+    tickets = fetch_tickets([entry for time_entries in per_month for entry in time_entries], api)
+    products = api.get_product_options()
+
+    exports = []
+    for month, time_entries in zip(months, per_month):
+        tickets_details, contract_data = invoice_details(time_entries, products, google_client, api, tickets=tickets, month_date=month)
+        exports.append((month, invoice_frame(tickets_details, month), contract_data))
+    return exports
+
+
+def month_range(first: datetime.datetime, last: datetime.datetime) -> List[datetime.datetime]:
+    """The first day of each month from `first` through `last`, in either order, oldest first."""
+    first, last = min(first, last), max(first, last)
+    months = []
+    while first <= last:
+        months.append(first)
+        first += relativedelta(months=1)
+    return months
+
+
+def main():
+    last_month = (datetime.date.today().replace(day=1) - relativedelta(months=1)).strftime("%Y-%m")
+    parser = argparse.ArgumentParser(description="Write the Xero invoice CSV for a month or a range of months.")
+    parser.add_argument("--month", default=last_month, help="Month to invoice as YYYY-MM (default: last month)")
+    parser.add_argument("--through", help="Last month to invoice as YYYY-MM, for a range starting at --month")
+    parser.add_argument("--out", help="CSV file to write (default: standard output)")
+    args = parser.parse_args()
+
+    first = datetime.datetime.strptime(args.month, "%Y-%m")
+    last = datetime.datetime.strptime(args.through, "%Y-%m") if args.through else first
+    google_client = setup_google_sheets(st.secrets["gcp_service_account"])
+    frames = [frame for _, frame, _ in export_months(month_range(first, last), google_client)]
+    if args.out:
+        with open(args.out, "w", newline="", encoding="utf-8") as f:
+            write_csv(frames, f)
+        invoice_count = sum(frame['InvoiceNumber'].nunique() for frame in frames)
+        print(f"Wrote {sum(map(len, frames))} rows for {invoice_count} invoices to {args.out}", file=sys.stderr)
+    else:
+        write_csv(frames, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
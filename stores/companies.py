@@ -0,0 +1,92 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Union
+
+# Friendlier labels for the currencies clients are billed in
+CURRENCY_SYMBOLS = {
+    "USD": "$",
+    "EUR": "€",
+    "GBP": "£",
+    "AUD": "A$",
+    "CAD": "C$",
+    "NZD": "NZ$",
+    "JPY": "¥",
+}
+
+
+def parse_number(value) -> Optional[Union[int, float]]:
+    """Read a numeric custom field, keeping ints and floats as they are and parsing strings."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        return None
+
+
+@dataclass(frozen=True)
+class CompanyRecord:
+    """A Freshdesk company with its billing fields parsed."""
+    id: int
+    name: str
+    code: Optional[str]
+    currency: Optional[str]
+    hourly_rate: Optional[Union[int, float]]
+    inclusive_hours: Optional[Union[int, float]]
+    custom_fields: Dict = field(default_factory=dict, compare=False, repr=False)
+
+    @property
+    def currency_symbol(self) -> str:
+        return CURRENCY_SYMBOLS.get(self.currency, self.currency or '')
+
+    @classmethod
+    def from_api(cls, company: Dict) -> "CompanyRecord":
+        custom_fields = company.get('custom_fields') or {}
+        return cls(
+            id=company['id'],
+            name=company.get('name', 'Unknown'),
+            code=custom_fields.get('company_code'),
+            currency=custom_fields.get('currency'),
+            hourly_rate=parse_number(custom_fields.get('contract_hourly_rate')),
+            inclusive_hours=parse_number(custom_fields.get('inclusive_hours')),
+            custom_fields=custom_fields,
+        )
+
+
+class CompanyIndex:
+    """
+    Companies keyed by ID, company code and name.
+
+    Built once from the companies list so views never have to scan it or fetch
+    companies one at a time.
+    """
+
+    def __init__(self, companies: List[Dict]):
+        self._companies = [CompanyRecord.from_api(c) for c in companies]
+        self._by_id = {c.id: c for c in self._companies}
+        self._by_code = {c.code: c for c in self._companies if c.code}
+        self._by_name = {c.name: c for c in self._companies}
+
+    def __len__(self) -> int:
+        return len(self._companies)
+
+    def __iter__(self):
+        return iter(self._companies)
+
+    def by_id(self, company_id) -> Optional[CompanyRecord]:
+        return self._by_id.get(company_id)
+
+    def by_code(self, company_code: str) -> Optional[CompanyRecord]:
+        return self._by_code.get(company_code)
+
+    def by_name(self, name: str) -> Optional[CompanyRecord]:
+        return self._by_name.get(name)
+
+    def name_for(self, company_id, default: str = "Unknown") -> str:
+        company = self._by_id.get(company_id)
+        return company.name if company else default
+
+    def names(self) -> List[str]:
+        """Company names in the order Freshdesk returned them."""
+        return [c.name for c in self._companies]
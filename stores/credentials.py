@@ -0,0 +1,200 @@
+import hashlib
+import hmac
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from utils import data_path
+
+logger = logging.getLogger(__name__)
+
+# PBKDF2-HMAC-SHA256 rounds for stored password hashes
+PBKDF2_ITERATIONS = 260_000
+HASH_SCHEME = "pbkdf2_sha256"
+
+
+def hash_password(password: str, salt: Optional[bytes] = None, iterations: int = PBKDF2_ITERATIONS) -> str:
+    """
+    Hash a password with a random per-user salt, so it never has to be kept in plain text outside the sheet.
+
+    Returns:
+        str: "pbkdf2_sha256$<iterations>$<salt hex>$<hash hex>", as check_password() expects.
+    """
+    salt = salt if salt is not None else os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", str(password).encode(), salt, iterations)
+    return f"{HASH_SCHEME}${iterations}${salt.hex()}${digest.hex()}"
+
+
+def check_password(password: str, password_hash: str) -> bool:
+    """Whether a password matches a hash_password() hash."""
+    try:
+        scheme, iterations, salt, _ = password_hash.split("$")
+        if scheme != HASH_SCHEME:
+            return False
+        expected = hash_password(password, bytes.fromhex(salt), int(iterations))
+    except ValueError:
+        return False
+    return hmac.compare_digest(expected.encode(), password_hash.encode())
+
+
+def password_fingerprint(password: str, salt: Optional[bytes] = None) -> str:
+    """
+    A cheap salted hash of a password, kept next to its PBKDF2 hash to tell whether the
+    sheet's password changed without running PBKDF2 again.
+
+    Returns:
+        str: "<salt hex>$<HMAC-SHA256 hex>", as fingerprint_matches() expects.
+    """
+    salt = salt if salt is not None else os.urandom(16)
+    return f"{salt.hex()}${hmac.new(salt, str(password).encode(), hashlib.sha256).hexdigest()}"
+
+
+def fingerprint_matches(password: str, fingerprint: Optional[str]) -> bool:
+    """Whether a password matches a password_fingerprint()."""
+    try:
+        salt, _ = fingerprint.split("$")
+        expected = password_fingerprint(password, bytes.fromhex(salt))
+    except (AttributeError, ValueError):
+        return False
+    return hmac.compare_digest(expected.encode(), fingerprint.encode())
+
+
+class CredentialStore:
+    """
+    Username-keyed index of the Clients sheet.
+
+    Logins are answered from memory. The index is refreshed from Google Sheets in a
+    background thread once it is older than `ttl` seconds, and every successful refresh
+    is written to a local SQLite mirror so the app can still log people in after a
+    restart while Sheets is slow or down.
+
+    Passwords are stored as salted PBKDF2 hashes. Each record also keeps a salted
+    fingerprint of its password, in memory and in the mirror, so a refresh only rehashes
+    the passwords that changed in the sheet, also after a restart.
+    """
+
+    def __init__(self, loader: Callable[[], List[Dict]], mirror_path: str, ttl: int = 300):
+        self._loader = loader
+        self._mirror_path = mirror_path
+        self._ttl = ttl
+        self._index: Dict[str, Dict] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._load_mirror()
+
+    def lookup(self, username: str) -> Optional[Dict]:
+        """Return the stored record for a username, if there is one."""
+        self._ensure_fresh()
+        return self._index.get(str(username).strip())
+
+    def authenticate(self, username: str, password: str) -> Optional[str]:
+        """Return the client code if the username and password match."""
+        record = self.lookup(username)
+        if record and check_password(password, record["password_hash"]):
+            return record["client_code"]
+        return None
+
+    def client_codes(self) -> List[str]:
+        """All client codes currently in the index."""
+        self._ensure_fresh()
+        # Codes come from the sheet as they were typed, so blank and numeric ones are possible
+        codes = {str(record["client_code"]).strip() for record in self._index.values() if record["client_code"] is not None}
+        codes.discard("")
+        return sorted(codes)
+
+    def refresh(self):
+        """Reload the index from the sheet and update the local mirror."""
+        records = self._loader()
+        index = {}
+        for record in records:
+            username = str(record.get("Username", "")).strip()
+            if not username:
+                continue
+            password = str(record.get("Password", ""))
+            known = self._index.get(username)
+            if known and fingerprint_matches(password, known["password_fingerprint"]):
+                password_hash, fingerprint = known["password_hash"], known["password_fingerprint"]
+            else:
+                password_hash, fingerprint = hash_password(password), password_fingerprint(password)
+            index[username] = {
+                "password_hash": password_hash,
+                "password_fingerprint": fingerprint,
+                "client_code": record.get("Client code"),
+            }
+        with self._lock:
+            self._index = index
+            self._loaded_at = time.time()
+        self._write_mirror(index)
+
+    def _ensure_fresh(self):
+        if not self._index:
+            # Nothing in memory or in the mirror yet: this is the one time we have to wait
+            self.refresh()
+        elif time.time() - self._loaded_at > self._ttl:
+            self._refresh_in_background()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the existing index; we'll try again after the next lookup
+                logger.warning("Credential refresh failed: %s", e)
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="credential-refresh", daemon=True).start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._mirror_path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS credentials ("
+            "username TEXT PRIMARY KEY, password_hash TEXT NOT NULL, password_fingerprint TEXT, client_code TEXT, loaded_at REAL NOT NULL)"
+        )
+        if "password_fingerprint" not in [row[1] for row in conn.execute("PRAGMA table_info(credentials)")]:
+            # Mirrors written before fingerprints were kept; their passwords are rehashed on the next refresh
+            conn.execute("ALTER TABLE credentials ADD COLUMN password_fingerprint TEXT")
+        return conn
+
+    def _load_mirror(self):
+        try:
+            with self._connect() as conn:
+                rows = conn.execute("SELECT username, password_hash, password_fingerprint, client_code, loaded_at FROM credentials").fetchall()
+        except sqlite3.Error as e:
+            logger.warning("Could not read credential mirror: %s", e)
+            return
+        # Rows hashed with an older scheme can't be checked; the first lookup then waits for a refresh
+        self._index = {
+            username: {"password_hash": password_hash, "password_fingerprint": fingerprint, "client_code": client_code}
+            for username, password_hash, fingerprint, client_code, _ in rows
+            if password_hash.startswith(f"{HASH_SCHEME}$")
+        }
+        # Treat the mirror as stale so the first lookup triggers a background refresh
+        self._loaded_at = min((row[4] for row in rows), default=0.0) - self._ttl
+
+    def _write_mirror(self, index: Dict[str, Dict]):
+        loaded_at = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM credentials")
+                conn.executemany(
+                    "INSERT INTO credentials (username, password_hash, password_fingerprint, client_code, loaded_at) VALUES (?, ?, ?, ?, ?)",
+                    [(u, r["password_hash"], r["password_fingerprint"], r["client_code"], loaded_at) for u, r in index.items()],
+                )
+        except sqlite3.Error as e:
+            logger.warning("Could not write credential mirror: %s", e)
+
+
+def open_credential_store(loader: Callable[[], List[Dict]], ttl: int = 300) -> CredentialStore:
+    """Create a credential store backed by the default local mirror."""
+    return CredentialStore(loader, data_path("credentials.sqlite"), ttl=ttl)
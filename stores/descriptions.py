@@ -0,0 +1,81 @@
+import datetime
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class DescriptionStore:
+    """
+    Size-bounded cache of plain-text ticket descriptions.
+
+    Ticket listings are fetched without descriptions; descriptions are put here
+    whenever a response happens to include them and read back on demand. Entries
+    are keyed by ticket ID and remember the `updated_at` they were fetched for, so
+    an edited ticket's description is fetched again. The least recently used
+    descriptions are dropped once their text exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[int, Tuple[Optional[datetime.datetime], str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        """Approximate memory held by the stored text."""
+        return self._bytes
+
+    def get(self, ticket_id: int, updated_at: Optional[datetime.datetime] = None) -> Optional[str]:
+        """The description of a ticket, or None if it isn't stored or is older than `updated_at`."""
+        with self._lock:
+            entry = self._entries.get(ticket_id)
+            if entry is None:
+                return None
+            stored_at, text = entry
+            if updated_at is not None and (stored_at is None or stored_at < updated_at):
+                return None
+            self._entries.move_to_end(ticket_id)
+            return text
+
+    def put(self, ticket_id: int, updated_at: Optional[datetime.datetime], text: str):
+        with self._lock:
+            previous = self._entries.pop(ticket_id, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            self._entries[ticket_id] = (updated_at, text)
+            self._bytes += len(text)
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def discard(self, ticket_id: int):
+        with self._lock:
+            previous = self._entries.pop(ticket_id, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+
+    def invalidate(self):
+        """Forget every stored description."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_many(self, tickets: Iterable) -> Tuple[Dict[int, str], List]:
+        """
+        Look up the descriptions of several tickets.
+
+        Returns:
+            tuple: ({ticket_id: description} for the stored ones, [tickets not stored])
+        """
+        found, missing = {}, []
+        for ticket in tickets:
+            text = self.get(ticket.id, ticket.updated_at)
+            if text is None:
+                missing.append(ticket)
+            else:
+                found[ticket.id] = text
+        return found, missing
@@ -0,0 +1,152 @@
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from apis.records import Ticket
+
+PHRASE_RE = re.compile(r'"([^"]*)"|(\S+)')
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def stamp(ticket: Ticket) -> Optional[str]:
+    """The ticket's `updated_at` as stored alongside the index."""
+    return ticket.updated_at.isoformat() if ticket.updated_at else None
+
+
+def build_match_query(search: str) -> Optional[str]:
+    """
+    Turn a search box string into an FTS5 MATCH expression.
+
+    Quoted text becomes a phrase query; every other word is matched as a prefix,
+    and all terms must be present.
+
+    Args:
+        search (str): The raw text typed by the user.
+
+    Returns:
+        str: An FTS5 query, or None if the search contains no searchable terms.
+    """
+    terms = []
+    for phrase, word in PHRASE_RE.findall(search):
+        if phrase:
+            tokens = TOKEN_RE.findall(phrase)
+            if tokens:
+                terms.append('"' + " ".join(tokens) + '"')
+        else:
+            terms.extend(f'"{token}"*' for token in TOKEN_RE.findall(word))
+    return " AND ".join(terms) if terms else None
+
+
+class TicketSearchIndex:
+    """
+    Full-text index over ticket subjects and descriptions, backed by SQLite FTS5.
+    The index only holds the words, not the text itself (on SQLite 3.43 or later).
+
+    Tickets are added incrementally as they are fetched; a ticket is only
+    re-indexed when its `updated_at` changes. Listings don't carry descriptions,
+    so a ticket's subject is indexed straight away and its description once it
+    has been loaded (see `tickets_without_descriptions`).
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            try:
+                # Contentless, so the index doesn't keep a second copy of every description.
+                # Deleting from a contentless table needs SQLite 3.43 or later.
+                self._conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS ticket_text USING fts5("
+                    "subject, description, tokenize='unicode61 remove_diacritics 2', "
+                    "content='', contentless_delete=1)"
+                )
+            except sqlite3.OperationalError:
+                self._conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS ticket_text USING fts5("
+                    "subject, description, tokenize='unicode61 remove_diacritics 2')"
+                )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS indexed_tickets "
+                "(ticket_id INTEGER PRIMARY KEY, updated_at TEXT, has_description INTEGER NOT NULL DEFAULT 0)"
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM indexed_tickets").fetchone()[0]
+
+    def _known(self) -> Dict[int, Tuple[Optional[str], int]]:
+        rows = self._conn.execute("SELECT ticket_id, updated_at, has_description FROM indexed_tickets")
+        return {ticket_id: (updated_at, has_description) for ticket_id, updated_at, has_description in rows}
+
+    def add_tickets(self, tickets: Iterable[Ticket], descriptions: Optional[Dict[int, str]] = None) -> int:
+        """
+        Index new or changed tickets.
+
+        Args:
+            tickets: Ticket records.
+            descriptions: Plain-text descriptions by ticket ID, for the tickets
+                whose description has been loaded.
+
+        Returns:
+            int: The number of tickets that were (re)indexed.
+        """
+        descriptions = descriptions or {}
+        with self._lock:
+            known = self._known()
+            changed = [
+                t for t in tickets
+                if t.id not in known
+                or known[t.id][0] != stamp(t)
+                or (t.id in descriptions and not known[t.id][1])
+            ]
+            if not changed:
+                return 0
+            with self._conn:
+                self._conn.executemany(
+                    "DELETE FROM ticket_text WHERE rowid = ?", [(t.id,) for t in changed]
+                )
+                self._conn.executemany(
+                    "INSERT INTO ticket_text (rowid, subject, description) VALUES (?, ?, ?)",
+                    [(t.id, t.subject, descriptions.get(t.id, "")) for t in changed],
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO indexed_tickets (ticket_id, updated_at, has_description) VALUES (?, ?, ?)",
+                    [(t.id, stamp(t), int(t.id in descriptions)) for t in changed],
+                )
+            return len(changed)
+
+    def tickets_without_descriptions(self, tickets: Iterable[Ticket]) -> List[Ticket]:
+        """The tickets whose current description isn't indexed yet."""
+        with self._lock:
+            known = self._known()
+        return [
+            t for t in tickets
+            if t.id not in known or known[t.id][0] != stamp(t) or not known[t.id][1]
+        ]
+
+    def search(self, search: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Find tickets matching a search string.
+
+        Args:
+            search (str): The raw search text (see `build_match_query`).
+            limit (int, optional): Maximum number of results.
+
+        Returns:
+            list: (ticket_id, score) pairs, best match first. Lower scores rank higher.
+        """
+        query = build_match_query(search)
+        if not query:
+            return []
+        # Subject matches count for more than description matches
+        sql = (
+            "SELECT rowid, bm25(ticket_text, 10.0, 1.0) AS score FROM ticket_text "
+            "WHERE ticket_text MATCH ? ORDER BY score"
+        )
+        params = [query]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
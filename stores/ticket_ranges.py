@@ -0,0 +1,212 @@
+import datetime
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from apis.cache import approximate_size
+from apis.records import Ticket, MIN_TIMESTAMP
+
+logger = logging.getLogger(__name__)
+
+Interval = Tuple[datetime.datetime, datetime.datetime]
+
+
+class TicketRangeCache:
+    """
+    Tickets cached by the updated-at ranges they were fetched for.
+
+    A request for [start, end) only fetches the sub-ranges that aren't already
+    covered by a fresh fetch, then answers from the merged cache. Ranges go stale
+    after `ttl` seconds. A range that reached "now" when it was fetched is treated
+    as covering the following `tail_grace` seconds too, so repeated "up to now"
+    requests don't each hit the API.
+
+    With `max_stale` set, stale ranges younger than `max_stale` seconds are still
+    served straight away and refetched in a background thread
+    (stale-while-revalidate); only ranges older than that are fetched while the
+    caller waits.
+    """
+
+    def __init__(self, fetch: Callable[[datetime.datetime, datetime.datetime], List[Ticket]], ttl: int = 3600, tail_grace: int = 300, max_stale: int = None):
+        self._fetch = fetch
+        self._ttl = ttl
+        self._tail_grace = tail_grace
+        self._max_stale = max_stale if max_stale is not None else ttl
+        self._tickets: Dict[int, Ticket] = {}
+        # (start, end, fetched_at) for every fetched range, oldest fetch first
+        self._ranges: List[Tuple[datetime.datetime, datetime.datetime, float]] = []
+        self._lock = threading.RLock()
+        self._refreshing: List[Interval] = []
+        # Ranges callers are fetching while they wait, each set once its fetch is done
+        self._fetching: Dict[Interval, threading.Event] = {}
+
+    def __len__(self) -> int:
+        return len(self._tickets)
+
+    @property
+    def size_bytes(self) -> int:
+        """Approximate memory held by the cached tickets (walks every record, so not for hot paths)."""
+        with self._lock:
+            return approximate_size(self._tickets)
+
+    def oldest_age(self) -> Optional[float]:
+        """Seconds since the oldest range still cached was fetched."""
+        with self._lock:
+            if not self._ranges:
+                return None
+            return time.time() - min(fetched_at for _, _, fetched_at in self._ranges)
+
+    def get(self, start: datetime.datetime, end: datetime.datetime) -> List[Ticket]:
+        """Tickets whose latest `updated_at` is in [start, end), fetching only what's missing."""
+        # Nothing can have been updated in the future, so never fetch past now
+        fetch_end = min(end, datetime.datetime.now(datetime.timezone.utc))
+        # Fetch outside the lock, so a slow fetch doesn't hold up readers of other ranges or webhook updates
+        missing = self._claim_missing(start, fetch_end)
+        try:
+            for missing_start, missing_end in missing:
+                tickets = self._fetch(missing_start, missing_end)
+                with self._lock:
+                    self._store(missing_start, missing_end, tickets)
+        finally:
+            with self._lock:
+                for missing_range in missing:
+                    self._fetching.pop(missing_range).set()
+        with self._lock:
+            for stale_start, stale_end in self.missing_ranges(start, fetch_end):
+                self._refresh_in_background(stale_start, stale_end)
+            return [
+                ticket for ticket in self._tickets.values()
+                if start <= (ticket.updated_at or MIN_TIMESTAMP) < end
+            ]
+
+    def missing_ranges(self, start: datetime.datetime, end: datetime.datetime, allow_stale: bool = False) -> List[Interval]:
+        """
+        Sub-ranges of [start, end) not covered by a fresh fetch.
+
+        Args:
+            allow_stale: Count stale (but not yet too stale) fetches as covering their range.
+        """
+        now = time.time()
+        now_dt = datetime.datetime.now(datetime.timezone.utc)
+        max_age = self._max_stale if allow_stale else self._ttl
+        covered = []
+        with self._lock:
+            kept = [r for r in self._ranges if now - r[2] < self._max_stale]
+            if len(kept) < len(self._ranges):
+                self._ranges = kept
+                self._drop_uncovered()
+            for range_start, range_end, fetched_at in self._ranges:
+                if now - fetched_at >= max_age:
+                    continue
+                fetched_dt = datetime.datetime.fromtimestamp(fetched_at, datetime.timezone.utc)
+                if range_end >= fetched_dt:
+                    # Nothing newer than the fetch existed yet; extend over the grace period
+                    range_end = max(range_end, min(now_dt, fetched_dt + datetime.timedelta(seconds=self._tail_grace)))
+                covered.append((range_start, range_end))
+        covered.sort()
+
+        missing = []
+        cursor = start
+        for range_start, range_end in covered:
+            if range_end <= cursor:
+                continue
+            if range_start >= end:
+                break
+            if range_start > cursor:
+                missing.append((cursor, range_start))
+            cursor = max(cursor, range_end)
+        if cursor < end:
+            missing.append((cursor, end))
+        return missing
+
+    def invalidate(self, start: datetime.datetime = None, end: datetime.datetime = None):
+        """Forget fetched ranges overlapping [start, end) (everything by default)."""
+        with self._lock:
+            if start is None and end is None:
+                self._ranges = []
+                self._tickets = {}
+                return
+            start = start or datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+            end = end or datetime.datetime.max.replace(tzinfo=datetime.timezone.utc)
+            self._ranges = [r for r in self._ranges if r[1] <= start or r[0] >= end]
+            self._drop_uncovered()
+
+    def update(self, ticket: Ticket):
+        """Replace a cached ticket with a newer copy (e.g. from a webhook), without refetching any range."""
+        with self._lock:
+            known = self._tickets.get(ticket.id)
+            if known is None or (ticket.updated_at or MIN_TIMESTAMP) >= (known.updated_at or MIN_TIMESTAMP):
+                self._tickets[ticket.id] = ticket
+
+    def discard(self, ticket_id: int):
+        """Forget a single ticket, e.g. one that was deleted or moved to another company."""
+        with self._lock:
+            self._tickets.pop(ticket_id, None)
+
+    def _claim_missing(self, start: datetime.datetime, end: datetime.datetime) -> List[Interval]:
+        """
+        The ranges of [start, end) this caller must fetch, marked as being fetched.
+
+        Waits for other callers' fetches that overlap them first, so concurrent
+        misses fetch each range once.
+        """
+        while True:
+            with self._lock:
+                missing = self.missing_ranges(start, end, allow_stale=True)
+                pending = [
+                    event for (f_start, f_end), event in self._fetching.items()
+                    if any(f_start < m_end and m_start < f_end for m_start, m_end in missing)
+                ]
+                if not pending:
+                    for missing_range in missing:
+                        self._fetching[missing_range] = threading.Event()
+                    return missing
+            for event in pending:
+                event.wait()
+
+    def _refresh_in_background(self, start: datetime.datetime, end: datetime.datetime):
+        """Refetch a stale range in a daemon thread, unless it's already being refreshed."""
+        with self._lock:
+            if any(r_start <= start and end <= r_end for r_start, r_end in self._refreshing):
+                return
+            self._refreshing.append((start, end))
+
+        def refresh():
+            try:
+                tickets = self._fetch(start, end)
+                with self._lock:
+                    self._store(start, end, tickets)
+            except Exception:
+                logger.warning("Background refresh of tickets from %s to %s failed", start, end, exc_info=True)
+            finally:
+                with self._lock:
+                    self._refreshing.remove((start, end))
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def _drop_uncovered(self):
+        """Forget tickets no remaining range covers, so removed ranges don't leave their tickets behind."""
+        covered = []
+        for range_start, range_end, fetched_at in self._ranges:
+            fetched_dt = datetime.datetime.fromtimestamp(fetched_at, datetime.timezone.utc)
+            if range_end + datetime.timedelta(seconds=self._tail_grace) >= fetched_dt:
+                # Reached (about) "now" when fetched, so it also holds the newer copies update() put in since
+                range_end = datetime.datetime.max.replace(tzinfo=datetime.timezone.utc)
+            covered.append((range_start, range_end))
+        self._tickets = {
+            ticket_id: ticket for ticket_id, ticket in self._tickets.items()
+            if any(range_start <= (ticket.updated_at or MIN_TIMESTAMP) < range_end for range_start, range_end in covered)
+        }
+
+    def _store(self, start: datetime.datetime, end: datetime.datetime, tickets: List[Ticket]):
+        # The fresh fetch is authoritative for its range: drop copies that have since moved out of it
+        self._tickets = {
+            ticket_id: ticket for ticket_id, ticket in self._tickets.items()
+            if not start <= (ticket.updated_at or MIN_TIMESTAMP) < end
+        }
+        for ticket in tickets:
+            known = self._tickets.get(ticket.id)
+            if known is None or (ticket.updated_at or MIN_TIMESTAMP) >= (known.updated_at or MIN_TIMESTAMP):
+                self._tickets[ticket.id] = ticket
+        self._ranges.append((start, end, time.time()))
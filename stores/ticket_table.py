@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from apis.records import Ticket
+from logic import status_mapping
+
+TICKET_URL = "https://mademedia.freshdesk.com/support/tickets/{}"
+
+# Display column -> Ticket attribute for fields that can hold several values per ticket
+MULTI_VALUE_FIELDS = {
+    "Category": "categories",
+    "Ticket Type": "ticket_types",
+}
+
+# Columns shown as filter facets with per-option counts
+FACET_COLUMNS = ("status_readable", "Category", "Ticket Type", "Assigned To", "Group")
+
+
+class TicketTable:
+    """
+    Columnar view of a set of tickets for the ticket finder.
+
+    Low-cardinality columns (status, agent, group) are categoricals, and multi-value
+    custom fields are exploded into a long `tags` frame of (row, field, value) so that
+    every filter can be applied as a vectorised boolean mask.
+    """
+
+    def __init__(self, frame: pd.DataFrame, tags: pd.DataFrame):
+        self.frame = frame
+        self.tags = tags
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @classmethod
+    def from_tickets(cls, tickets: List[Ticket], agent_names: Dict, group_names: Dict) -> "TicketTable":
+        """
+        Build the table from ticket records.
+
+        Args:
+            tickets: Ticket records.
+            agent_names: Mapping of responder ID to agent name.
+            group_names: Mapping of group ID to group name.
+        """
+        def agent_name(agent_id):
+            return "Unassigned" if not agent_id else agent_names.get(agent_id, "Unknown")
+
+        def group_name(group_id):
+            return "None" if not group_id else group_names.get(group_id, "Unknown")
+
+        def status_name(status):
+            return "Unknown" if status is None else status_mapping.get(status, str(status))
+
+        multi_values = {
+            column: [getattr(t, attribute) or ("Unknown",) for t in tickets]
+            for column, attribute in MULTI_VALUE_FIELDS.items()
+        }
+        now = pd.Timestamp.now(tz="UTC")
+
+        frame = pd.DataFrame({
+            "id": pd.array([t.id for t in tickets], dtype="int64"),
+            "subject": [t.subject for t in tickets],
+            "company_id": pd.array([t.company_id for t in tickets], dtype="Int64"),
+            "status_readable": pd.Categorical([status_name(t.status) for t in tickets]),
+            "Assigned To": pd.Categorical([agent_name(t.responder_id) for t in tickets]),
+            "Group": pd.Categorical([group_name(t.group_id) for t in tickets]),
+            "CR?": np.array([t.change_request for t in tickets], dtype=bool),
+            "Estimate": np.array([t.estimate for t in tickets], dtype="float64"),
+            "created_at": pd.to_datetime([t.created_at or now for t in tickets], utc=True),
+            "updated_at": pd.to_datetime([t.updated_at or now for t in tickets], utc=True),
+        })
+        for column, values in multi_values.items():
+            frame[column] = [", ".join(v) for v in values]
+        frame["ticket_url"] = frame["id"].map(TICKET_URL.format)
+
+        # Explode the multi-value fields into one row per (ticket, value)
+        tag_rows, tag_fields, tag_values = [], [], []
+        for column, values in multi_values.items():
+            for row, row_values in enumerate(values):
+                for value in row_values:
+                    tag_rows.append(row)
+                    tag_fields.append(column)
+                    tag_values.append(value)
+        tags = pd.DataFrame({
+            "row": np.array(tag_rows, dtype="int64"),
+            "field": pd.Categorical(tag_fields, categories=list(MULTI_VALUE_FIELDS)),
+            "value": pd.Categorical(tag_values),
+        })
+        return cls(frame, tags)
+
+    def options(self, column: str) -> List[str]:
+        """Sorted distinct values for a filterable column."""
+        if column in MULTI_VALUE_FIELDS:
+            values = self.tags.loc[self.tags["field"] == column, "value"].unique()
+        else:
+            values = self.frame[column].unique()
+        return sorted(str(v) for v in values)
+
+    def multi_value_mask(self, column: str, values: Iterable[str]) -> np.ndarray:
+        """Rows where any value of a multi-value column is in `values`."""
+        mask = np.zeros(len(self.frame), dtype=bool)
+        tags = self.tags
+        hits = tags.loc[(tags["field"] == column) & tags["value"].isin(list(values)), "row"]
+        mask[hits.to_numpy()] = True
+        return mask
+
+    def filter_masks(
+        self,
+        statuses: Iterable[str] = (),
+        categories: Iterable[str] = (),
+        ticket_types: Iterable[str] = (),
+        agents: Iterable[str] = (),
+        groups: Iterable[str] = (),
+        estimate_range: Optional[Tuple[float, float]] = None,
+        change_requests_only: bool = False,
+        ticket_ids: Optional[Iterable[int]] = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        One boolean row mask per active filter, keyed by the column it filters.
+
+        Empty selections don't filter. `ticket_ids` restricts the result to the given
+        tickets (e.g. full-text search hits).
+        """
+        frame = self.frame
+        masks = {}
+        if ticket_ids is not None:
+            masks["id"] = frame["id"].isin(list(ticket_ids)).to_numpy()
+        if statuses:
+            masks["status_readable"] = frame["status_readable"].isin(list(statuses)).to_numpy()
+        if categories:
+            masks["Category"] = self.multi_value_mask("Category", categories)
+        if ticket_types:
+            masks["Ticket Type"] = self.multi_value_mask("Ticket Type", ticket_types)
+        if agents:
+            masks["Assigned To"] = frame["Assigned To"].isin(list(agents)).to_numpy()
+        if groups:
+            masks["Group"] = frame["Group"].isin(list(groups)).to_numpy()
+        if estimate_range:
+            min_est, max_est = estimate_range
+            estimates = frame["Estimate"].to_numpy()
+            masks["Estimate"] = (estimates >= min_est) & (estimates <= max_est) & (estimates > 0)
+        if change_requests_only:
+            masks["CR?"] = frame["CR?"].to_numpy()
+        return masks
+
+    def mask(self, **filters) -> np.ndarray:
+        """Combine the finder's filters (see `filter_masks`) into a single boolean row mask."""
+        mask = np.ones(len(self.frame), dtype=bool)
+        for filter_mask in self.filter_masks(**filters).values():
+            mask &= filter_mask
+        return mask
+
+    def facet_counts(self, **filters) -> Dict[str, Dict[str, int]]:
+        """
+        Ticket counts per value for each facet column, for the current filters.
+
+        Each facet is counted against every filter except its own, so the counts next
+        to a facet's options show what selecting them would add, as search-engine
+        facets do.
+
+        Returns:
+            dict: {facet column: {value: count}}
+        """
+        masks = self.filter_masks(**filters)
+        all_rows = np.ones(len(self.frame), dtype=bool)
+        counts = {}
+        for column in FACET_COLUMNS:
+            base = all_rows.copy()
+            for name, filter_mask in masks.items():
+                if name != column:
+                    base &= filter_mask
+            if column in MULTI_VALUE_FIELDS:
+                # Tag values share one categorical across fields, so only report this field's values
+                tags = self.tags[self.tags["field"] == column]
+                values = tags["value"].cat
+                all_codes = values.codes.to_numpy()
+                codes = all_codes[base[tags["row"].to_numpy()]]
+            else:
+                values = self.frame[column].cat
+                all_codes = values.codes.to_numpy()
+                codes = all_codes[base]
+            categories = values.categories
+            present = np.bincount(all_codes[all_codes >= 0], minlength=len(categories)) > 0
+            tallies = np.bincount(codes[codes >= 0], minlength=len(categories))
+            counts[column] = {
+                str(value): int(n) for value, n, is_present in zip(categories, tallies, present) if is_present
+            }
+        return counts
@@ -0,0 +1,301 @@
+import contextlib
+import datetime
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from apis.records import TimeEntry
+from utils import data_path
+
+# Days after a month ends before it counts as closed, leaving time for late entries and billing fixes
+CLOSE_GRACE_DAYS = 10
+
+ENTRY_SCHEMA = pa.schema([
+    ("ticket_id", pa.int64()),
+    ("executed_at", pa.timestamp("us", tz="UTC")),
+    ("hours", pa.float64()),
+    ("time_spent_in_seconds", pa.int64()),
+    ("billable", pa.bool_()),
+    # Hours billed after the contract rules in logic.calculate_billable_time
+    ("billable_hours", pa.float64()),
+])
+
+TICKET_SCHEMA = pa.schema([
+    ("ticket_id", pa.int64()),
+    ("subject", pa.string()),
+    ("company_id", pa.int64()),
+    ("company_name", pa.string()),
+    ("product_id", pa.int64()),
+    ("product_name", pa.string()),
+    ("responder_id", pa.int64()),
+    ("agent_name", pa.string()),
+    ("group_id", pa.int64()),
+    ("group_name", pa.string()),
+    ("billing_statuses", pa.list_(pa.string())),
+    ("ticket_types", pa.list_(pa.string())),
+    ("change_request", pa.bool_()),
+    ("estimate", pa.float64()),
+    ("updated_at", pa.timestamp("us", tz="UTC")),
+])
+
+# Ticket columns joined onto entries (Arrow joins can't carry list columns)
+JOINED_TICKET_COLUMNS = [field.name for field in TICKET_SCHEMA if not pa.types.is_list(field.type)]
+
+# Columns each aggregation groups by
+DIMENSIONS = {
+    "month": ["month"],
+    "company": ["company_id", "company_name"],
+    "product": ["product_name"],
+    "agent": ["agent_name"],
+    "group": ["group_name"],
+    "ticket": ["ticket_id", "subject", "company_name"],
+}
+
+
+class TimeEntryStore:
+    """
+    Time entries and the tickets they belong to, kept locally as Parquet.
+
+    Entries are partitioned by the month they were executed in
+    (`entries/month=YYYY-MM/*.parquet`) so a month can be rewritten on its own
+    and queries only read the months they need. Tickets are a single dimension
+    table (`tickets.parquet`) with the names of their company, product, agent
+    and group resolved at sync time. Files are written to a temporary name and
+    moved into place, so readers never see half-written data. Writes hold an
+    exclusive lock on `.lock` in the store's folder, so app replicas and worker
+    processes sharing the folder don't lose each other's updates.
+
+    Each month also has a sync record in `months.json`. A month is closed once
+    an admin closes it, or CLOSE_GRACE_DAYS after it ends provided it was fully
+    synced after that point and nothing has changed since. Closed months are
+    final: they are served from here and never fetched again.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._entries_dir = os.path.join(root, "entries")
+        self._tickets_path = os.path.join(root, "tickets.parquet")
+        self._state_path = os.path.join(root, "months.json")
+        self._lock_path = os.path.join(root, ".lock")
+        self._write_lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+        os.makedirs(self._entries_dir, exist_ok=True)
+
+    def months(self) -> List[str]:
+        """Synced months as YYYY-MM strings, oldest first."""
+        return sorted(
+            name.split("=", 1)[1] for name in os.listdir(self._entries_dir)
+            if name.startswith("month=") and os.listdir(os.path.join(self._entries_dir, name))
+        )
+
+    def write_month(self, month: str, entries: Iterable[Dict]):
+        """Replace one month's entries. `entries` are dicts with the ENTRY_SCHEMA columns."""
+        table = pa.Table.from_pylist(list(entries), schema=ENTRY_SCHEMA)
+        month_dir = os.path.join(self._entries_dir, f"month={month}")
+        os.makedirs(month_dir, exist_ok=True)
+        with self._locked():
+            self._write_atomic(table, os.path.join(month_dir, "part-0.parquet"))
+
+    def merge_month(self, month: str, entries: Iterable[Dict], since: datetime.datetime):
+        """Replace a month's entries executed at or after `since`, keeping the earlier ones."""
+        with self._locked():
+            kept = [row for row in self._read_month(month).to_pylist() if row["executed_at"] is not None and row["executed_at"] < since]
+            fetched = [row for row in entries if row["executed_at"] is None or row["executed_at"] >= since]
+            self.write_month(month, kept + fetched)
+
+    def month_entries(self, month: str, company_id: Optional[int] = None) -> List[TimeEntry]:
+        """A stored month's time entries as records, optionally only those on one company's tickets."""
+        table = self._read_month(month)
+        if company_id is not None:
+            tickets = self.tickets()
+            company_tickets = tickets.filter(pc.equal(tickets["company_id"], company_id))["ticket_id"]
+            table = table.filter(pc.is_in(table["ticket_id"], value_set=company_tickets))
+        return [
+            TimeEntry(
+                ticket_id=row["ticket_id"],
+                billable=bool(row["billable"]),
+                time_spent_in_seconds=row["time_spent_in_seconds"] if row["time_spent_in_seconds"] is not None else round(row["hours"] * 3600),
+                # Same tzinfo as records parsed from the API
+                executed_at=row["executed_at"].replace(tzinfo=datetime.timezone.utc) if row["executed_at"] else None,
+            )
+            for row in table.to_pylist()
+        ]
+
+    def month_state(self, month: str) -> Dict:
+        """
+        The sync record of a month.
+
+        Returns:
+            dict: synced_at and full_synced_at (epoch seconds of the last sync and
+            the last full sync), changed_at (last change reported after a sync) and
+            closed (True or False if an admin set it, None to infer it).
+        """
+        return {"synced_at": None, "full_synced_at": None, "changed_at": None, "closed": None, **self._load_state().get(month, {})}
+
+    def record_sync(self, month: str, full: bool = True):
+        now = time.time()
+        self._update_state(month, synced_at=now, **({"full_synced_at": now} if full else {}))
+
+    def mark_changed(self, month: str):
+        """Note that a month's entries changed, so an inferred closure waits for another full sync."""
+        self._update_state(month, changed_at=time.time())
+
+    def set_closed(self, month: str, closed: Optional[bool]):
+        """Close or reopen a month, or pass None to go back to closing it after the grace period."""
+        self._update_state(month, closed=closed)
+
+    def is_closed(self, month: str, today: Optional[datetime.date] = None) -> bool:
+        state = self.month_state(month)
+        if state["closed"] is not None:
+            return state["closed"]
+        closes_on = month_end(month) + datetime.timedelta(days=CLOSE_GRACE_DAYS)
+        if (today or datetime.date.today()) <= closes_on or not state["full_synced_at"]:
+            return False
+        closes_at = datetime.datetime.combine(closes_on, datetime.time.min).timestamp()
+        return state["full_synced_at"] >= max(closes_at, state["changed_at"] or 0)
+
+    def upsert_tickets(self, tickets: Iterable[Dict]):
+        """Add or replace ticket rows (dicts with the TICKET_SCHEMA columns)."""
+        table = pa.Table.from_pylist(list(tickets), schema=TICKET_SCHEMA)
+        with self._locked():
+            if os.path.exists(self._tickets_path):
+                existing = pq.read_table(self._tickets_path, schema=TICKET_SCHEMA)
+                keep = pc.invert(pc.is_in(existing["ticket_id"], value_set=table["ticket_id"]))
+                table = pa.concat_tables([existing.filter(keep), table])
+            self._write_atomic(table, self._tickets_path)
+
+    def tickets(self) -> pa.Table:
+        if not os.path.exists(self._tickets_path):
+            return TICKET_SCHEMA.empty_table()
+        return pq.read_table(self._tickets_path, schema=TICKET_SCHEMA)
+
+    def entries(self, start_month: Optional[str] = None, end_month: Optional[str] = None, company_id: Optional[int] = None) -> pa.Table:
+        """
+        Time entries joined with their tickets, for the months in [start_month, end_month].
+
+        Only the matching month partitions are read. Entries whose ticket isn't
+        in the ticket table are kept, with empty ticket columns. Multi-value
+        ticket fields are left out; read them from `tickets()`.
+        """
+        entry_schema = ENTRY_SCHEMA.append(pa.field("month", pa.string()))
+        if self.months():
+            dataset = ds.dataset(
+                self._entries_dir, format="parquet", schema=entry_schema,
+                partitioning=ds.partitioning(pa.schema([("month", pa.string())]), flavor="hive"),
+            )
+            month_filter = None
+            if start_month:
+                month_filter = ds.field("month") >= start_month
+            if end_month:
+                end_filter = ds.field("month") <= end_month
+                month_filter = end_filter if month_filter is None else month_filter & end_filter
+            entries = dataset.to_table(filter=month_filter)
+        else:
+            entries = entry_schema.empty_table()
+        table = entries.join(self.tickets().select(JOINED_TICKET_COLUMNS), "ticket_id", join_type="left outer")
+        if company_id is not None:
+            table = table.filter(pc.equal(table["company_id"], company_id))
+        return table
+
+    def hours_by(self, dimension: str, start_month: Optional[str] = None, end_month: Optional[str] = None, company_id: Optional[int] = None) -> pd.DataFrame:
+        """
+        Hours, billable hours and entry counts grouped by a dimension.
+
+        Args:
+            dimension: A DIMENSIONS key: month, company, product, agent, group or ticket.
+            start_month, end_month: Inclusive YYYY-MM bounds; all synced months if not given.
+            company_id: Only count this company's tickets.
+
+        Returns:
+            pd.DataFrame: The dimension's columns plus hours, billable_hours and
+            entries, largest hours first (oldest first when grouping by month).
+        """
+        keys = DIMENSIONS[dimension]
+        table = self.entries(start_month, end_month, company_id)
+        grouped = table.group_by(keys).aggregate([
+            ("hours", "sum"),
+            ("billable_hours", "sum"),
+            ("hours", "count"),
+        ]).rename_columns(keys + ["hours", "billable_hours", "entries"])
+        if dimension == "month":
+            return grouped.sort_by("month").to_pandas()
+        return grouped.sort_by([("hours", "descending")]).to_pandas()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Hold the store's write lock: a thread lock, plus a lock file for other processes. Reentrant."""
+        with self._write_lock:
+            if self._lock_depth == 0:
+                lock_file = open(self._lock_path, "a")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_file = lock_file
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    # Closing the file releases the lock
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _read_month(self, month: str) -> pa.Table:
+        month_dir = os.path.join(self._entries_dir, f"month={month}")
+        if not os.path.isdir(month_dir):
+            return ENTRY_SCHEMA.empty_table()
+        # Read as a dataset so files written before a column was added still load, with nulls
+        return ds.dataset(month_dir, format="parquet", schema=ENTRY_SCHEMA).to_table()
+
+    def _load_state(self) -> Dict[str, Dict]:
+        try:
+            with open(self._state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _update_state(self, month: str, **changes):
+        with self._locked():
+            state = self._load_state()
+            state[month] = {**state.get(month, {}), **changes}
+            tmp_path = f"{self._state_path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self._state_path)
+
+    def _write_atomic(self, table: pa.Table, path: str):
+        # Dot-prefixed, so dataset scans skip it until it is moved into place
+        directory, name = os.path.split(path)
+        tmp_path = os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+
+
+def month_end(month: str) -> datetime.date:
+    """Last day of a YYYY-MM month."""
+    year, month_number = map(int, month.split("-"))
+    next_month = datetime.date(year + month_number // 12, month_number % 12 + 1, 1)
+    return next_month - datetime.timedelta(days=1)
+
+
+def calendar_month(start_date: Optional[str], end_date: Optional[str]) -> Optional[str]:
+    """The YYYY-MM month a YYYY-MM-DD date range covers exactly, or None if it isn't one whole month."""
+    if not start_date or not end_date or not start_date.endswith("-01"):
+        return None
+    month = start_date[:7]
+    return month if end_date == month_end(month).isoformat() else None
+
+
+def open_time_entry_store() -> TimeEntryStore:
+    """The time entry store in the local data directory."""
+    return TimeEntryStore(os.path.dirname(data_path("analytics", "tickets.parquet")))
@@ -1,7 +1,27 @@
+import os
 import streamlit as st
 from datetime import date, timedelta, datetime
 from dateutil.relativedelta import relativedelta
 
+from apis.cache import entity_cache, budget_from_env
+
+# Local folder for on-disk mirrors and caches (override with SUPPORT_REPORTS_DATA_DIR)
+DATA_DIR = os.environ.get("SUPPORT_REPORTS_DATA_DIR", ".data")
+
+def data_path(*parts: str) -> str:
+    """
+    Build a path inside the local data directory, creating its parent folder if needed.
+
+    Args:
+        *parts (str): Path components relative to the data directory.
+
+    Returns:
+        str: The full path.
+    """
+    path = os.path.join(DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
 def get_fiscal_year(date_obj=None):
     """
     Determine the fiscal year for a given date in the format "YY/YY".
@@ -24,6 +44,33 @@ def get_fiscal_year(date_obj=None):
     else:
         return f"{year_short - 1}/{year_short}"
 
+def fiscal_year_months(fiscal_year):
+    """
+    The months of a fiscal year, October to September.
+
+    Args:
+        fiscal_year (str): Fiscal year in "YY/YY" format, as returned by get_fiscal_year.
+
+    Returns:
+        list: The first day of each month as a date, oldest first.
+    """
+    first_month = date(2000 + int(fiscal_year.split("/")[0]), 10, 1)
+    return [first_month + relativedelta(months=i) for i in range(12)]
+
+def month_bounds(month_date):
+    """
+    First and last day of a month, formatted the way the Monthly and Xero pages request time entries.
+
+    Args:
+        month_date (date): Any day in the month.
+
+    Returns:
+        tuple: (start_date, end_date) as YYYY-MM-DD strings.
+    """
+    first_day = month_date.replace(day=1)
+    last_day = first_day + relativedelta(months=1) - timedelta(days=1)
+    return first_day.strftime("%Y-%m-%d"), last_day.strftime("%Y-%m-%d")
+
 def month_selector(years_back: int = 3, label: str = "Select month") -> str:
     """
     Displays a selectbox with a reverse-chronological list of months going back `years_back` years,
@@ -59,6 +106,24 @@ def date_range_selector():
             "end_date": end_date.strftime('%Y-%m-%d')
         }
 
+@entity_cache("contract_sheet", budget_from_env("contract_sheet", 8), ttl=3600, namespace="contract sheet")
+def get_worksheet_values(client, spreadsheet_id, title):
+    """
+    All values of one worksheet, cached so each fiscal year's tab is read once an hour.
+
+    Args:
+        client: Google Sheets client (not part of the cache key)
+        spreadsheet_id: The spreadsheet to read
+        title: The worksheet title, e.g. a fiscal year like "23/24"
+
+    Returns:
+        list: Rows of cell values, or None if there is no such worksheet.
+    """
+    for ws in client.open_by_key(spreadsheet_id).worksheets():
+        if ws.title == title:
+            return ws.get_all_values()
+    return None
+
 def get_support_contract_data(client, company_code, month_date=None):
     """
     Fetch support contract data for a specific client and month from the Google Spreadsheet.
@@ -92,22 +157,12 @@ def get_support_contract_data(client, company_code, month_date=None):
     prev_fiscal_year = get_fiscal_year(prev_month_date)
     
     try:
-        # Open the spreadsheet 
-        spreadsheet = client.open_by_key(spreadsheet_id)
-        
-        # Find the worksheet for the current fiscal year
-        worksheet = None
-        for ws in spreadsheet.worksheets():
-            if ws.title == fiscal_year:
-                worksheet = ws
-                break
+        # Get all values from the current fiscal year's worksheet (handles merged cells better)
+        all_values = get_worksheet_values(client, spreadsheet_id, fiscal_year)
         
-        if not worksheet:
+        if all_values is None:
             return {"error": f"Could not find worksheet for fiscal year {fiscal_year}"}
         
-        # Get all values from the worksheet (handles merged cells better)
-        all_values = worksheet.get_all_values()
-        
         if not all_values:
             return {"error": "Worksheet is empty"}
         
@@ -166,15 +221,10 @@ def get_support_contract_data(client, company_code, month_date=None):
         # Special case for October: look at previous fiscal year's September
         if month_date.month == 10:  # October
             # We need September from the previous fiscal year's worksheet
-            prev_worksheet = None
-            for ws in spreadsheet.worksheets():
-                if ws.title == prev_fiscal_year:
-                    prev_worksheet = ws
-                    break
+            prev_values = get_worksheet_values(client, spreadsheet_id, prev_fiscal_year)
             
-            if prev_worksheet:
+            if prev_values is not None:
                 # Get September's "Carry over to next month" value from previous fiscal year
-                prev_values = prev_worksheet.get_all_values()
                 
                 # Find the client in the previous worksheet
                 prev_client_row = None
@@ -0,0 +1,183 @@
+import streamlit as st
+import pandas as pd
+
+import apis.cache
+from apis.cache import CACHES
+from apis.freshdesk import freshdesk_api
+from stores.time_entry_store import CLOSE_GRACE_DAYS, month_end, open_time_entry_store
+from workers.analytics_sync import sync_month
+from utils import month_bounds
+# Imported for its contract sheet cache, so it is listed even before the first lookup
+import utils
+
+NAMESPACES = ["tickets", "time entries", "companies", "directories", "contract sheet"]
+
+
+def format_age(seconds):
+    if seconds is None:
+        return "—"
+    if seconds < 60:
+        return f"{seconds:.0f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def oldest_age(cache):
+    """Age of the oldest entry, or None for caches that don't track when entries were stored."""
+    return cache.oldest_age() if hasattr(cache, "oldest_age") else None
+
+
+def display_cache_console(client_code: str):
+    """Show what's cached per namespace, with targeted invalidation."""
+    if client_code != "admin":
+        st.error("This view is only available to admin users.")
+        return
+
+    parts = freshdesk_api.cache_parts()
+    if apis.cache.SHARED_BACKEND is not None:
+        st.info(f"API lookups are shared with the other app instances through a {type(apis.cache.SHARED_BACKEND).__name__}. Sizes and ages below are for this instance's copy.")
+
+    st.subheader("Namespaces")
+    namespace_rows = []
+    for namespace in NAMESPACES:
+        caches = [cache for part_namespace, _, cache in parts if part_namespace == namespace]
+        ages = [age for age in map(oldest_age, caches) if age is not None]
+        namespace_rows.append({
+            "Namespace": namespace,
+            "Entries": sum(len(cache) for cache in caches),
+            "Size (MB)": sum(cache.size_bytes for cache in caches) / 1024 / 1024,
+            "Oldest entry": format_age(max(ages) if ages else None),
+        })
+    st.dataframe(
+        pd.DataFrame(namespace_rows),
+        column_config={"Size (MB)": st.column_config.NumberColumn("Size (MB)", format="%.2f")},
+        hide_index=True,
+    )
+
+    st.subheader("Clear cached data")
+    st.caption("Cleared data is fetched again the next time a page needs it.")
+    namespace_col, company_col, ticket_col = st.columns(3)
+
+    with namespace_col:
+        namespace = st.selectbox("Namespace", NAMESPACES)
+        if st.button(f"Clear {namespace}"):
+            freshdesk_api.invalidate_namespace(namespace)
+            st.success(f"Cleared {namespace}.")
+
+    with company_col:
+        company_index = freshdesk_api.get_company_index()
+        company_name = st.selectbox("Company", company_index.names())
+        if st.button("Clear company") and company_name:
+            company = company_index.by_name(company_name)
+            dropped = freshdesk_api.invalidate_company(company.id)
+            st.success(f"Cleared {dropped} cached entries for {company.name}.")
+
+    with ticket_col:
+        ticket_id = st.number_input("Ticket ID", min_value=1, step=1, value=None)
+        if st.button("Refresh ticket") and ticket_id:
+            ticket = freshdesk_api.invalidate_ticket(int(ticket_id))
+            if ticket is None:
+                st.warning(f"Ticket #{int(ticket_id)} no longer exists; removed it from the caches.")
+            else:
+                st.success(f"Refreshed ticket #{ticket.id}.")
+
+    display_time_entry_months()
+
+    with st.expander("Cache details"):
+        rows = []
+        for name, cache in CACHES.items():
+            stats = cache.stats
+            lookups = stats.hits + stats.stale_hits + stats.misses
+            rows.append({
+                "Cache": name,
+                "Namespace": cache.namespace,
+                "Entries": len(cache),
+                "Size (MB)": cache.size_bytes / 1024 / 1024,
+                "Budget (MB)": cache.max_bytes / 1024 / 1024,
+                "Hits": stats.hits,
+                "Misses": stats.misses,
+                "Hit rate": stats.hits / lookups * 100 if lookups else 0.0,
+                "Stale hits": stats.stale_hits,
+                "Shared hits": stats.shared_hits,
+                "Refreshes": stats.refreshes,
+                "Failed refreshes": stats.refresh_failures,
+                "Evictions": stats.evictions,
+                "Expired": stats.expirations,
+                "Oldest entry": format_age(cache.oldest_age()),
+            })
+
+        st.caption("Cached API lookups and lists since the app last started. Stale hits were served past their TTL while a background refresh ran.")
+        st.dataframe(
+            pd.DataFrame(rows),
+            column_config={
+                "Size (MB)": st.column_config.NumberColumn("Size (MB)", format="%.2f"),
+                "Budget (MB)": st.column_config.NumberColumn("Budget (MB)", format="%.0f"),
+                "Hit rate": st.column_config.ProgressColumn("Hit rate", format="%.0f%%", min_value=0, max_value=100),
+            },
+            hide_index=True,
+        )
+
+
+def display_time_entry_months():
+    """Closed months are served from local storage; let admins close or reopen them."""
+    st.subheader("Time entry months")
+    st.caption(
+        f"Closed months are served from local storage and never fetched from Freshdesk again. "
+        f"Months close on their own {CLOSE_GRACE_DAYS} days after they end, once they have been fully synced. "
+        f"Entries and hours are what local storage holds for each month."
+    )
+    store = open_time_entry_store()
+    months = list(reversed(store.months()))
+    if not months:
+        st.write("No months synced yet.")
+        return
+
+    stored_hours = store.hours_by("month").set_index("month")
+    rows = []
+    for month in months:
+        state = store.month_state(month)
+        if state["closed"] is True:
+            status = "Closed by admin"
+        elif state["closed"] is False:
+            status = "Kept open by admin"
+        else:
+            status = "Closed" if store.is_closed(month) else "Open"
+        rows.append({
+            "Month": month,
+            "Status": status,
+            "Entries": int(stored_hours.at[month, "entries"]) if month in stored_hours.index else 0,
+            "Hours": stored_hours.at[month, "hours"] if month in stored_hours.index else 0.0,
+            "Billable hours": stored_hours.at[month, "billable_hours"] if month in stored_hours.index else 0.0,
+            "Last full sync": pd.to_datetime(state["full_synced_at"], unit="s", utc=True) if state["full_synced_at"] else None,
+            "Last sync": pd.to_datetime(state["synced_at"], unit="s", utc=True) if state["synced_at"] else None,
+        })
+    st.dataframe(
+        pd.DataFrame(rows),
+        column_config={
+            "Hours": st.column_config.NumberColumn("Hours", format="%.1f h"),
+            "Billable hours": st.column_config.NumberColumn("Billable hours", format="%.1f h"),
+        },
+        hide_index=True,
+    )
+
+    month = st.selectbox("Month", months)
+    close_col, reopen_col, auto_col = st.columns(3)
+    with close_col:
+        if st.button("Sync and close"):
+            with st.spinner(f"Syncing {month}..."):
+                _, _, complete = sync_month(*month_bounds(month_end(month)), store=store, full=True, include_closed=True)
+            if not complete:
+                st.error(f"Some of {month}'s tickets couldn't be fetched, so it was left open. Try again later.")
+            else:
+                store.set_closed(month, True)
+                freshdesk_api.get_time_entries.cache.invalidate_keys_where(lambda key: key[0] is not None and key[0][:7] == month)
+                st.success(f"Closed {month}.")
+    with reopen_col:
+        if st.button("Reopen"):
+            store.set_closed(month, False)
+            st.success(f"{month} is open and will be fetched from Freshdesk again.")
+    with auto_col:
+        if st.button("Close after grace period"):
+            store.set_closed(month, None)
+            st.success(f"{month} will close {CLOSE_GRACE_DAYS} days after it ends, once fully synced.")
@@ -0,0 +1,65 @@
+import datetime
+
+import pandas as pd
+import streamlit as st
+
+from apis.freshdesk import freshdesk_api
+from apis.google import setup_google_sheets
+from reports.usage import time_entry_frame, contract_hours, client_overview
+from utils import month_selector
+
+
+def display_client_overview(client_code: str):
+    """Every client's billable hours, overage and estimated cost for one month."""
+    if client_code != "admin":
+        st.error("This view is only available to admin users.")
+        return
+
+    selected_month = month_selector()
+    month = datetime.datetime.strptime(selected_month, "%B %Y").date()
+    company_index = freshdesk_api.get_company_index()
+
+    with st.spinner(f"Fetching time entries for {selected_month}..."):
+        entries = time_entry_frame([month])
+    with st.spinner("Fetching support contract data..."):
+        google_client = setup_google_sheets(st.secrets["gcp_service_account"])
+        contracts = pd.DataFrame(
+            [contract_hours(google_client, company, month) for company in company_index],
+            index=[company.id for company in company_index],
+            columns=["inclusive_hours", "carryover_hours"],
+        )
+    overview = client_overview(entries, company_index, contracts)
+
+    over_contract = overview[overview["overage_hours"] > 0]
+    columns = st.columns(3)
+    columns[0].metric("Clients with time tracked", f"{(overview['hours'] > 0).sum()}")
+    columns[1].metric("Clients over contract", f"{len(over_contract)}")
+    columns[2].metric("Billable overage", f"{over_contract['overage_hours'].sum():.1f} h")
+
+    st.caption(
+        f"Billable hours against each client's inclusive and carryover hours for {selected_month}. "
+        "Estimated cost is the overage at the client's contract rate, in their currency. Click a column to sort."
+    )
+    st.dataframe(
+        overview.rename(columns={
+            "name": "Client",
+            "code": "Code",
+            "hours": "Total hours",
+            "billable_hours": "Billable hours",
+            "inclusive_hours": "Inclusive hours",
+            "carryover_hours": "Carryover",
+            "overage_hours": "Overage",
+            "currency_symbol": "Currency",
+            "hourly_rate": "Rate",
+            "estimated_cost": "Estimated cost",
+        })[["Client", "Code", "Total hours", "Billable hours", "Inclusive hours", "Carryover", "Overage", "Currency", "Rate", "Estimated cost"]],
+        column_config={
+            **{
+                column: st.column_config.NumberColumn(column, format="%.1f h")
+                for column in ["Total hours", "Billable hours", "Inclusive hours", "Carryover", "Overage"]
+            },
+            "Rate": st.column_config.NumberColumn("Rate", format="%.2f"),
+            "Estimated cost": st.column_config.NumberColumn("Estimated cost", format="%.2f"),
+        },
+        hide_index=True,
+    )
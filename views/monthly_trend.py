@@ -0,0 +1,120 @@
+import datetime
+from typing import List
+
+import pandas as pd
+import streamlit as st
+from dateutil.relativedelta import relativedelta
+
+from apis.google import setup_google_sheets
+from reports.usage import time_entry_frame, contract_hours
+from utils import get_fiscal_year, fiscal_year_months
+
+# Fiscal years offered in the range picker, counting back from the current one
+TREND_FISCAL_YEARS = 3
+# Months offered for a custom range, counting back from the current one
+TREND_MAX_MONTHS = 36
+
+BREAKDOWNS = {"Product": "product_name", "Ticket type": "ticket_type"}
+
+
+def display_usage_trend(company_data):
+    """Hours per month over a fiscal year or a custom range, against the contract's inclusive and carryover hours."""
+    months = trend_month_selector()
+    if not months:
+        st.write("No months in this range yet.")
+        return
+
+    with st.spinner(f"Fetching time entries for {len(months)} months..."):
+        entries = time_entry_frame(months, company_data.id)
+    with st.spinner("Fetching support contract data..."):
+        contract = fetch_contract_hours(company_data, months)
+
+    labels = [month.strftime("%Y-%m") for month in months]
+    usage = (
+        entries.groupby("month")[["hours", "billable_hours"]].sum()
+        .reindex(labels, fill_value=0.0)
+        .join(contract)
+    )
+    usage.index.name = "Month"
+    usage["allowance"] = usage["inclusive_hours"] + usage["carryover_hours"]
+    usage["overage"] = (usage["billable_hours"] - usage["allowance"]).clip(lower=0)
+
+    first, last = months[0].strftime("%B %Y"), months[-1].strftime("%B %Y")
+    st.subheader(f"Support hours usage from {first} to {last}")
+    columns = st.columns(4)
+    columns[0].metric("Total hours tracked", f"{usage['hours'].sum():.1f} h")
+    columns[1].metric("Billable hours", f"{usage['billable_hours'].sum():.1f} h")
+    columns[2].metric("Inclusive hours", f"{usage['inclusive_hours'].sum():.1f} h")
+    columns[3].metric("Months over allowance", f"{(usage['overage'] > 0).sum()} of {len(usage)}")
+
+    st.caption("Billable hours per month against the contract's inclusive hours, and inclusive hours plus the previous month's carryover")
+    st.line_chart(usage.rename(columns={
+        "billable_hours": "Billable hours",
+        "hours": "Total hours",
+        "inclusive_hours": "Inclusive hours",
+        "allowance": "Inclusive + carryover",
+    })[["Billable hours", "Total hours", "Inclusive hours", "Inclusive + carryover"]])
+
+    breakdown = st.radio("Break billable hours down by", list(BREAKDOWNS), horizontal=True)
+    by_breakdown = entries.pivot_table(
+        index="month", columns=BREAKDOWNS[breakdown], values="billable_hours", aggfunc="sum", fill_value=0.0,
+    ).reindex(labels, fill_value=0.0)
+    st.bar_chart(by_breakdown.loc[:, by_breakdown.sum() > 0])
+
+    st.dataframe(
+        usage.reset_index().rename(columns={
+            "hours": "Total hours",
+            "billable_hours": "Billable hours",
+            "inclusive_hours": "Inclusive hours",
+            "carryover_hours": "Carryover",
+            "allowance": "Allowance",
+            "overage": "Overage",
+        }),
+        column_config={
+            column: st.column_config.NumberColumn(column, format="%.1f h")
+            for column in ["Total hours", "Billable hours", "Inclusive hours", "Carryover", "Allowance", "Overage"]
+        },
+        hide_index=True,
+    )
+
+
+def trend_month_selector() -> List[datetime.date]:
+    """
+    Let the user pick a fiscal year or a range of months, up to the current month.
+
+    Returns:
+        list: The first day of each selected month, oldest first.
+    """
+    this_month = datetime.date.today().replace(day=1)
+    if st.radio("Range", ["Fiscal year", "Custom range"], horizontal=True) == "Fiscal year":
+        fiscal_years = [get_fiscal_year(this_month - relativedelta(years=i)) for i in range(TREND_FISCAL_YEARS)]
+        fiscal_year = st.selectbox("Fiscal year", fiscal_years)
+        return [month for month in fiscal_year_months(fiscal_year) if month <= this_month]
+
+    options = [this_month - relativedelta(months=i) for i in range(TREND_MAX_MONTHS)]
+    from_col, to_col = st.columns(2)
+    with from_col:
+        first = st.selectbox("From", options, index=11, format_func=lambda d: d.strftime("%B %Y"))
+    with to_col:
+        last = st.selectbox("To", options, index=0, format_func=lambda d: d.strftime("%B %Y"))
+    first, last = min(first, last), max(first, last)
+    months = []
+    while first <= last:
+        months.append(first)
+        first += relativedelta(months=1)
+    return months
+
+
+def fetch_contract_hours(company_data, months: List[datetime.date]) -> pd.DataFrame:
+    """
+    Inclusive and carryover hours per month from the support contract spreadsheet.
+
+    Returns:
+        pd.DataFrame: inclusive_hours and carryover_hours, indexed by YYYY-MM month.
+    """
+    google_client = setup_google_sheets(st.secrets["gcp_service_account"])
+    return pd.DataFrame(
+        [contract_hours(google_client, company_data, month) for month in months],
+        index=[month.strftime("%Y-%m") for month in months],
+        columns=["inclusive_hours", "carryover_hours"],
+    )
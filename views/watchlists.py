@@ -3,8 +3,13 @@ import pandas as pd
 import datetime
 from datetime import timedelta
 from apis.freshdesk import freshdesk_api
+from apis.ticket_query import TicketQuery
 from logic import status_mapping
 
+def format_timestamp(value):
+    """Format a record timestamp for the watchlist tables."""
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else None
+
 def display_watchlists(client_code: str, filters_container=None):
     """Display watchlists for admin users."""
     # Verify user is admin
@@ -25,13 +30,9 @@ def display_watchlists(client_code: str, filters_container=None):
         try:
             # Get groups from the tickets instead of assuming IDs
             # This ensures we only show groups that actually have tickets
-            companies = freshdesk_api.get_companies()
             sample_tickets = freshdesk_api.get_tickets()[:100]  # Limit to 100 recent tickets
             
-            group_ids = set()
-            for ticket in sample_tickets:
-                if ticket.get('group_id'):
-                    group_ids.add(ticket.get('group_id'))
+            group_ids = {ticket.group_id for ticket in sample_tickets if ticket.group_id}
             
             for group_id in group_ids:
                 try:
@@ -58,9 +59,8 @@ def display_watchlists(client_code: str, filters_container=None):
             # Get categories from sample tickets' custom fields
             sample_tickets = freshdesk_api.get_tickets()[:100]  # Limit to 100 recent tickets
             for ticket in sample_tickets:
-                if ticket.get('custom_fields') and ticket['custom_fields'].get('category'):
-                    category = ticket['custom_fields'].get('category')
-                    if category and category not in categories:
+                for category in ticket.categories:
+                    if category not in categories:
                         categories.append(category)
         except Exception as e:
             st.warning(f"Could not fetch categories: {str(e)}")
@@ -116,10 +116,7 @@ def display_tickets_over_estimate(client_code: str, filter_groups=None, filter_p
     # Company selector for admins
     with col2:
         if client_code == "admin":
-            companies = freshdesk_api.get_companies()
-            company_options = {
-                c["name"]: c["id"] for c in companies
-            }
+            company_options = freshdesk_api.get_companies_options()
             company_options["All Companies"] = None
             selected_company = st.selectbox(
                 "Select company", 
@@ -129,12 +126,7 @@ def display_tickets_over_estimate(client_code: str, filter_groups=None, filter_p
             company_id = company_options[selected_company]
         else:
             # For non-admin users, get their company ID
-            companies = freshdesk_api.get_companies()
-            company_id = None
-            for c in companies:
-                if c['custom_fields'].get('company_code') == client_code:
-                    company_id = c['id']
-                    break
+            company_id = freshdesk_api.get_company_id(client_code)
 
     # Show progress information while fetching data
     import time
@@ -146,11 +138,10 @@ def display_tickets_over_estimate(client_code: str, filter_groups=None, filter_p
     
     # Get tickets updated since specified date
     updated_since = lookback_date.strftime("%Y-%m-%d")
-    tickets = freshdesk_api.get_tickets(updated_since=updated_since)
-    
-    # Filter by company if needed
-    if company_id:
-        tickets = [t for t in tickets if t.get('company_id') == company_id]
+    tickets = freshdesk_api.find_tickets(TicketQuery(
+        start_date=updated_since,
+        company_ids=(company_id,) if company_id else (),
+    ))
     
     # Calculate elapsed time
     elapsed_time = time.time() - start_time
@@ -167,6 +158,15 @@ def display_tickets_over_estimate(client_code: str, filter_groups=None, filter_p
         st.info("No tickets found within the selected parameters.")
         return
     
+    # For a single company, fetch all of its time entries in one go rather than per ticket
+    company_time_by_ticket = None
+    if company_id:
+        company_time_by_ticket = {}
+        for entry in freshdesk_api.get_time_entries(company_id=company_id):
+            company_time_by_ticket[entry.ticket_id] = company_time_by_ticket.get(entry.ticket_id, 0.0) + entry.hours
+    
+    company_index = freshdesk_api.get_company_index()
+
     # Calculate time spent for each ticket
     over_estimate_tickets = []
     
@@ -189,62 +189,54 @@ def display_tickets_over_estimate(client_code: str, filter_groups=None, filter_p
         # Update status periodically
         if i % max(1, len(tickets) // 10) == 0:
             progress_status.info(f"Analyzing tickets... ({i}/{len(tickets)} - {int(progress_percent*100)}%)")
-        ticket_id = ticket['id']
-        
-        # Extract estimate from custom fields
-        estimate_value = ticket['custom_fields'].get('estimate_hrs')
-        if estimate_value and isinstance(estimate_value, str) and estimate_value.replace('.', '', 1).isdigit():
-            estimate = float(estimate_value)
-        else:
-            estimate = 0.0
+        ticket_id = ticket.id
+        estimate = ticket.estimate
         
         # Skip tickets with no estimate
         if estimate <= 0:
             continue
         
         # Get all time entries for this ticket
-        try:
-            time_entries = freshdesk_api.get_time_entries(ticket_id=ticket_id)
-            total_time = sum([float(entry.get('time_spent_in_seconds', 0)) / 3600.0 for entry in time_entries])
-        except Exception as e:
-            # Skip this ticket if we can't get time entries
-            continue
+        if company_time_by_ticket is not None:
+            total_time = company_time_by_ticket.get(ticket_id, 0.0)
+        else:
+            try:
+                time_entries = freshdesk_api.get_time_entries(ticket_id=ticket_id)
+                total_time = sum(entry.hours for entry in time_entries)
+            except Exception as e:
+                # Skip this ticket if we can't get time entries
+                continue
         
         # Check if time exceeds estimate
         if total_time > estimate:
             # Get additional ticket details
-            company_name = "Unknown"
-            if ticket.get('company_id'):
-                company = freshdesk_api.get_company_by_id(ticket['company_id'])
-                company_name = company.get('name', 'Unknown')
+            company_name = company_index.name_for(ticket.company_id)
                 
             # Get agent information
             agent_name = "Unassigned"
-            if ticket.get('responder_id'):
-                agent = freshdesk_api.get_agent(ticket['responder_id'])
+            if ticket.responder_id:
+                agent = freshdesk_api.get_agent(ticket.responder_id)
                 agent_name = agent.get('contact', {}).get('name', 'Unknown')
                 
             # Get group information
             group_name = "None"
-            if ticket.get('group_id'):
-                group = freshdesk_api.get_group(ticket['group_id'])
+            if ticket.group_id:
+                group = freshdesk_api.get_group(ticket.group_id)
                 group_name = group.get('name', 'Unknown')
                 
             # Get product information
             product_name = "Unknown"
-            if ticket.get('product_id'):
+            if ticket.product_id:
                 product_options = freshdesk_api.get_product_options()
-                product_name = product_options.get(ticket.get('product_id'), "Unknown")
+                product_name = product_options.get(ticket.product_id, "Unknown")
                 
             # Get category information
-            category = "Unknown"
-            if ticket.get('custom_fields') and ticket['custom_fields'].get('category'):
-                category = ticket['custom_fields'].get('category')
+            category = ", ".join(ticket.categories) or "Unknown"
                 
             over_estimate_tickets.append({
                 'id': ticket_id,
-                'subject': ticket.get('subject', 'No subject'),
-                'status': status_mapping.get(ticket.get('status'), ticket.get('status')),
+                'subject': ticket.subject or 'No subject',
+                'status': status_mapping.get(ticket.status, ticket.status),
                 'company': company_name,
                 'assigned_to': agent_name,
                 'group': group_name,
@@ -254,8 +246,8 @@ def display_tickets_over_estimate(client_code: str, filter_groups=None, filter_p
                 'total_time': total_time,
                 'over_by': total_time - estimate,
                 'over_by_percent': ((total_time - estimate) / estimate) * 100 if estimate > 0 else 0,
-                'created_at': ticket.get('created_at'),
-                'updated_at': ticket.get('updated_at')
+                'created_at': format_timestamp(ticket.created_at),
+                'updated_at': format_timestamp(ticket.updated_at)
             })
     
     # Complete the progress and clean up
@@ -286,10 +278,6 @@ def display_tickets_over_estimate(client_code: str, filter_groups=None, filter_p
         lambda tid: f"https://mademedia.freshdesk.com/support/tickets/{tid}"
     )
     
-    # Format dates
-    df['created_at'] = pd.to_datetime(df['created_at']).dt.strftime("%Y-%m-%d %H:%M:%S")
-    df['updated_at'] = pd.to_datetime(df['updated_at']).dt.strftime("%Y-%m-%d %H:%M:%S")
-    
     # Apply sidebar filters if provided
     filtered_df = df.copy()
     if filter_groups:
@@ -352,13 +340,11 @@ def display_aging_unresolved_tickets(client_code: str, filter_groups=None, filte
     days_threshold = st.slider("Days since last update", 7, 90, 30)
     
     cutoff_date = (datetime.datetime.now() - timedelta(days=days_threshold)).strftime("%Y-%m-%d")
+    cutoff_day = datetime.date.fromisoformat(cutoff_date)
     
     # Company selector for admins
     if client_code == "admin":
-        companies = freshdesk_api.get_companies()
-        company_options = {
-            c["name"]: c["id"] for c in companies
-        }
+        company_options = freshdesk_api.get_companies_options()
         company_options["All Companies"] = None
         selected_company = st.selectbox(
             "Select company", 
@@ -368,12 +354,7 @@ def display_aging_unresolved_tickets(client_code: str, filter_groups=None, filte
         company_id = company_options[selected_company]
     else:
         # For non-admin users, get their company ID
-        companies = freshdesk_api.get_companies()
-        company_id = None
-        for c in companies:
-            if c['custom_fields'].get('company_code') == client_code:
-                company_id = c['id']
-                break
+        company_id = freshdesk_api.get_company_id(client_code)
     
     # Show progress information while fetching data
     import time
@@ -383,12 +364,17 @@ def display_aging_unresolved_tickets(client_code: str, filter_groups=None, filte
     fetch_status = st.empty()
     fetch_status.info(f"Fetching all tickets...")
     
-    # Get all tickets
-    tickets = freshdesk_api.get_tickets()
+    # Filter out resolved/closed/deferred and waiting on customer tickets
+    EXCLUDED_STATUSES = [3, 4, 5, 6, 12]  # Resolved, Closed, Deferred, Waiting on Customer, Deferred
     
-    # Filter by company if needed
-    if company_id:
-        tickets = [t for t in tickets if t.get('company_id') == company_id]
+    # Ask the API only for tickets last updated before the cutoff. Statuses are filtered
+    # below: search can't exclude statuses, and listing the wanted ones would drop custom ones.
+    lookback_start = (datetime.datetime.now() - timedelta(days=90)).strftime("%Y-%m-%d")
+    tickets = freshdesk_api.find_tickets(TicketQuery(
+        start_date=lookback_start,
+        end_date=cutoff_date,
+        company_ids=(company_id,) if company_id else (),
+    ))
     
     # Calculate elapsed time
     elapsed_time = time.time() - start_time
@@ -412,8 +398,7 @@ def display_aging_unresolved_tickets(client_code: str, filter_groups=None, filte
     progress_status.info(f"Analyzing {len(tickets)} tickets for aging issues...")
     progress_bar.progress(0.0)
     
-    # Filter out resolved/closed/deferred and waiting on customer tickets
-    EXCLUDED_STATUSES = [3, 4, 5, 6, 12]  # Resolved, Closed, Deferred, Waiting on Customer, Deferred
+    company_index = freshdesk_api.get_company_index()
     aging_tickets = []
     
     # Process each ticket with progress updates
@@ -427,54 +412,47 @@ def display_aging_unresolved_tickets(client_code: str, filter_groups=None, filte
             progress_status.info(f"Analyzing tickets... ({i}/{len(tickets)} - {int(progress_percent*100)}%)")
             
         # Skip if ticket has a status we want to exclude
-        if ticket.get('status') in EXCLUDED_STATUSES:
+        if ticket.status in EXCLUDED_STATUSES:
             continue
             
         # Skip if updated recently
-        updated_at = ticket.get('updated_at', '')
-        if updated_at > cutoff_date:
+        if ticket.updated_at is None or ticket.updated_at.date() >= cutoff_day:
             continue
             
         # Get company name
-        company_name = "Unknown"
-        if ticket.get('company_id'):
-            company = freshdesk_api.get_company_by_id(ticket['company_id'])
-            company_name = company.get('name', 'Unknown')
+        company_name = company_index.name_for(ticket.company_id)
             
         # Get agent information
         agent_name = "Unassigned"
-        if ticket.get('responder_id'):
-            agent = freshdesk_api.get_agent(ticket['responder_id'])
+        if ticket.responder_id:
+            agent = freshdesk_api.get_agent(ticket.responder_id)
             agent_name = agent.get('contact', {}).get('name', 'Unknown')
             
         # Get group information
         group_name = "None"
-        if ticket.get('group_id'):
-            group = freshdesk_api.get_group(ticket['group_id'])
+        if ticket.group_id:
+            group = freshdesk_api.get_group(ticket.group_id)
             group_name = group.get('name', 'Unknown')
             
         # Get ticket type
-        ticket_type = ticket['custom_fields'].get('cf_type', 'Unknown')
+        ticket_type = ", ".join(ticket.ticket_types) or "Unknown"
         
         # Get product information
         product_name = "Unknown"
-        if ticket.get('product_id'):
+        if ticket.product_id:
             product_options = freshdesk_api.get_product_options()
-            product_name = product_options.get(ticket.get('product_id'), "Unknown")
+            product_name = product_options.get(ticket.product_id, "Unknown")
             
         # Get category information
-        category = "Unknown"
-        if ticket.get('custom_fields') and ticket['custom_fields'].get('category'):
-            category = ticket['custom_fields'].get('category')
+        category = ", ".join(ticket.categories) or "Unknown"
             
         # Calculate days since last update
-        updated_date = datetime.datetime.strptime(updated_at.split('T')[0], '%Y-%m-%d').date()
-        days_since_update = (datetime.datetime.now().date() - updated_date).days
+        days_since_update = (datetime.datetime.now().date() - ticket.updated_at.date()).days
             
         aging_tickets.append({
-            'id': ticket.get('id'),
-            'subject': ticket.get('subject', 'No subject'),
-            'status': status_mapping.get(ticket.get('status'), ticket.get('status')),
+            'id': ticket.id,
+            'subject': ticket.subject or 'No subject',
+            'status': status_mapping.get(ticket.status, ticket.status),
             'company': company_name,
             'assigned_to': agent_name,
             'group': group_name,
@@ -482,8 +460,8 @@ def display_aging_unresolved_tickets(client_code: str, filter_groups=None, filte
             'category': category,
             'ticket_type': ticket_type,
             'days_since_update': days_since_update,
-            'created_at': ticket.get('created_at'),
-            'updated_at': updated_at
+            'created_at': format_timestamp(ticket.created_at),
+            'updated_at': format_timestamp(ticket.updated_at)
         })
     
     # Complete the progress and clean up
@@ -514,10 +492,6 @@ def display_aging_unresolved_tickets(client_code: str, filter_groups=None, filte
         lambda tid: f"https://mademedia.freshdesk.com/support/tickets/{tid}"
     )
     
-    # Format dates
-    df['created_at'] = pd.to_datetime(df['created_at']).dt.strftime("%Y-%m-%d %H:%M:%S")
-    df['updated_at'] = pd.to_datetime(df['updated_at']).dt.strftime("%Y-%m-%d %H:%M:%S")
-    
     # Apply sidebar filters if provided
     filtered_df = df.copy()
     if filter_groups:
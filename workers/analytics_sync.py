@@ -0,0 +1,184 @@
+"""
+Copy time entries and their tickets from Freshdesk into the local Parquet store.
+
+The cache warmer syncs the current and previous month after every pass. To
+backfill history (months past their grace period are closed once synced),
+run from the repository root:
+
+    python -m workers.analytics_sync --months 24
+"""
+import argparse
+import datetime
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+from dateutil.relativedelta import relativedelta
+
+from apis.freshdesk import FreshdeskAPI, freshdesk_api, FETCH_WORKERS
+from apis.records import Ticket
+from logic import calculate_billable_time
+from stores.time_entry_store import TimeEntryStore, open_time_entry_store
+from utils import month_bounds
+
+logger = logging.getLogger(__name__)
+
+# Parallel requests while syncing, as for the cache warmer
+SYNC_WORKERS = max(1, FETCH_WORKERS // 2)
+# An incremental sync of the current month refetches entries executed this long before the last sync
+INCREMENTAL_OVERLAP = datetime.timedelta(days=3)
+# The current month is still fully refetched this often, to pick up edits to older entries
+FULL_SYNC_INTERVAL = 24 * 3600
+
+
+def ticket_row(api: FreshdeskAPI, ticket: Ticket, product_options: Dict[int, str]) -> Dict:
+    """A TICKET_SCHEMA row, with the names of the ticket's product, agent and group resolved."""
+    agent_name = "Unassigned"
+    if ticket.responder_id:
+        agent_name = api.get_agent(ticket.responder_id).get('contact', {}).get('name', 'Unknown')
+    group_name = "None"
+    if ticket.group_id:
+        group_name = api.get_group(ticket.group_id).get('name', 'Unknown')
+    return {
+        "ticket_id": ticket.id,
+        "subject": ticket.subject or "No subject",
+        "company_id": ticket.company_id,
+        "company_name": api.get_company_index().name_for(ticket.company_id),
+        "product_id": ticket.product_id,
+        "product_name": product_options.get(ticket.product_id, "Unknown"),
+        "responder_id": ticket.responder_id,
+        "agent_name": agent_name,
+        "group_id": ticket.group_id,
+        "group_name": group_name,
+        "billing_statuses": list(ticket.billing_statuses),
+        "ticket_types": list(ticket.ticket_types),
+        "change_request": ticket.change_request,
+        "estimate": ticket.estimate,
+        "updated_at": ticket.updated_at,
+    }
+
+
+def fetch_ticket(api: FreshdeskAPI, ticket_id: int) -> Optional[Ticket]:
+    """A ticket, or None (logged) if it can't be fetched, so one bad ticket doesn't abort a month's sync."""
+    try:
+        return api.get_ticket_data(ticket_id)
+    except requests.RequestException as e:
+        logger.warning("Could not fetch ticket #%s while syncing; its entries are stored without ticket fields: %s", ticket_id, e)
+        return None
+
+
+def sync_month(start_date: str, end_date: str, api: FreshdeskAPI = freshdesk_api, store: TimeEntryStore = None, full: bool = False, include_closed: bool = False, listed_after: Optional[float] = None) -> Optional[Tuple[int, int, bool]]:
+    """
+    Sync one month of time entries and upsert the tickets they belong to.
+
+    Closed months are left alone unless `include_closed` is set. The current month is synced incrementally:
+    only entries executed since shortly before the last sync are fetched, with
+    a full refetch once a day. Other open months are always refetched in full.
+    Tickets that can't be fetched are skipped and logged, and the sync then
+    doesn't count as a full one.
+
+    Args:
+        start_date, end_date: The month's first and last day as YYYY-MM-DD strings.
+        full: Refetch the whole month even if an incremental sync would do.
+        include_closed: Sync the month even if it is closed, e.g. before an admin closes it.
+        listed_after: A full sync reuses a cached listing of the month stored at or
+            after this time (epoch seconds), such as one the cache warmer just
+            fetched, instead of fetching it again.
+
+    Returns:
+        tuple: (entries fetched, tickets written, complete), where complete is
+        True for a full sync that fetched every ticket, or None if the month is closed.
+    """
+    store = store or open_time_entry_store()
+    month = start_date[:7]
+    closed = store.is_closed(month)
+    if closed and not include_closed:
+        return None
+
+    state = store.month_state(month)
+    since = None
+    if (
+        not full
+        and not closed
+        and month == datetime.date.today().strftime("%Y-%m")
+        and state["full_synced_at"]
+        and time.time() - state["full_synced_at"] < FULL_SYNC_INTERVAL
+    ):
+        last_sync_day = datetime.datetime.fromtimestamp(state["synced_at"], datetime.timezone.utc).date()
+        since_day = max(datetime.date.fromisoformat(start_date), last_sync_day - INCREMENTAL_OVERLAP)
+        since = datetime.datetime.combine(since_day, datetime.time.min, datetime.timezone.utc)
+
+    if since is None:
+        listing_key = (start_date, end_date, None, None)
+        # A full sync may close the month for good, so it mustn't be served an older cached (or stale) listing
+        stored_at = api.get_time_entries.cache.stored_at(listing_key)
+        if listed_after is None or stored_at is None or stored_at < listed_after:
+            api.get_time_entries.cache.invalidate(listing_key)
+    product_options = api.get_product_options()
+    if closed:
+        # The cached listing of a closed month is read from the store, so ask Freshdesk itself
+        entries = api.list_time_entries(start_date, end_date)
+    else:
+        entries = api.get_time_entries(since.date().isoformat() if since else start_date, end_date)
+
+    ticket_ids = {entry.ticket_id for entry in entries if entry.ticket_id}
+    with ThreadPoolExecutor(max_workers=SYNC_WORKERS) as pool:
+        tickets = {ticket.id: ticket for ticket in pool.map(lambda ticket_id: fetch_ticket(api, ticket_id), ticket_ids) if ticket}
+        ticket_rows = list(pool.map(lambda t: ticket_row(api, t, product_options), tickets.values()))
+
+    entry_rows = []
+    for entry in entries:
+        ticket = tickets.get(entry.ticket_id)
+        entry_rows.append({
+            "ticket_id": entry.ticket_id,
+            "executed_at": entry.executed_at,
+            "hours": entry.hours,
+            "time_spent_in_seconds": entry.time_spent_in_seconds,
+            "billable": entry.billable,
+            "billable_hours": calculate_billable_time(entry, ticket, entry.hours, product_options) if ticket else 0.0,
+        })
+
+    store.upsert_tickets(ticket_rows)
+    if since is None:
+        store.write_month(month, entry_rows)
+    else:
+        store.merge_month(month, entry_rows, since)
+    # A month missing some of its tickets isn't fully synced, so it can't close on this sync
+    complete = since is None and len(tickets) == len(ticket_ids)
+    store.record_sync(month, full=complete)
+    return len(entry_rows), len(ticket_rows), complete
+
+
+def sync_months(months: Iterable[Tuple[str, str]], api: FreshdeskAPI = freshdesk_api, store: TimeEntryStore = None, full: bool = False, listed_after: Optional[float] = None):
+    """Sync several (start_date, end_date) months, logging each one. See sync_month() for `listed_after`."""
+    store = store or open_time_entry_store()
+    for start_date, end_date in months:
+        started = time.time()
+        synced = sync_month(start_date, end_date, api, store, full=full, listed_after=listed_after)
+        if synced is None:
+            logger.info("%s is closed; nothing to sync", start_date[:7])
+            continue
+        entry_count, ticket_count, _ = synced
+        logger.info("Synced %s time entries and %s tickets for %s in %.0f s", entry_count, ticket_count, start_date[:7], time.time() - started)
+
+
+def recent_months(count: int, today: datetime.date = None) -> List[Tuple[str, str]]:
+    """(start_date, end_date) of the last `count` months including the current one, oldest first."""
+    this_month = (today or datetime.date.today()).replace(day=1)
+    return [month_bounds(this_month - relativedelta(months=i)) for i in reversed(range(count))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync time entries and tickets into the local Parquet store.")
+    parser.add_argument("--months", type=int, default=2, help="How many months to sync, counting back from this one")
+    parser.add_argument("--full", action="store_true", help="Refetch the current month in full instead of incrementally")
+    args = parser.parse_args()
+    # Show the per-month progress on the console
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    sync_months(recent_months(args.months), full=args.full)
+
+
+if __name__ == "__main__":
+    main()
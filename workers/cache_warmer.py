@@ -0,0 +1,109 @@
+import datetime
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import streamlit as st
+
+from apis.freshdesk import FreshdeskAPI, freshdesk_api, FETCH_WORKERS
+from utils import month_bounds
+from workers.analytics_sync import sync_months
+
+logger = logging.getLogger(__name__)
+
+# Seconds between warming passes; shorter than the one-hour cache TTL so warmed entries never expire
+WARM_INTERVAL = 30 * 60
+# Parallel requests while warming, kept below the app's own so users still get a share of the rate limit
+WARM_WORKERS = max(1, FETCH_WORKERS // 2)
+
+
+def months_to_warm(today: datetime.date = None) -> List[Tuple[str, str]]:
+    """Date ranges of the current and previous month."""
+    today = today or datetime.date.today()
+    this_month = today.replace(day=1)
+    last_month = (this_month - datetime.timedelta(days=1)).replace(day=1)
+    return [month_bounds(this_month), month_bounds(last_month)]
+
+
+def warm_ticket(api: FreshdeskAPI, ticket_id: int):
+    """Load everything the Monthly and Xero pages look up for one ticket."""
+    ticket = api.get_ticket_data(ticket_id)
+    if ticket.requester_id:
+        api.get_requester(ticket.requester_id)
+    if ticket.responder_id:
+        api.get_agent(ticket.responder_id)
+    if ticket.group_id:
+        api.get_group(ticket.group_id)
+    api.get_time_entries(ticket_id=ticket_id)
+    return ticket
+
+
+def warm_caches(api: FreshdeskAPI = freshdesk_api) -> dict:
+    """
+    Run one warming pass.
+
+    Loads companies and products, then for the current and previous month the
+    time entries for all companies (Xero export) and for each company that
+    logged time (Monthly hours), and every ticket those entries belong to along
+    with its requester, agent, group and all-time entries.
+
+    Returns:
+        dict: Counts of what was warmed, for logging.
+    """
+    api.get_companies()
+    api.get_company_index()
+    api.get_product_options()
+
+    ticket_ids = set()
+    months = months_to_warm()
+    for start_date, end_date in months:
+        ticket_ids.update(entry.ticket_id for entry in api.get_time_entries(start_date, end_date) if entry.ticket_id)
+
+    company_ids = set()
+    with ThreadPoolExecutor(max_workers=WARM_WORKERS) as pool:
+        for future in [pool.submit(warm_ticket, api, ticket_id) for ticket_id in ticket_ids]:
+            try:
+                company_ids.add(future.result().company_id)
+            except Exception:
+                logger.exception("Cache warmer couldn't load a ticket")
+
+        company_ids.discard(None)
+        company_months = [(start_date, end_date, company_id) for start_date, end_date in months for company_id in company_ids]
+        for future in [pool.submit(api.get_time_entries, *args) for args in company_months]:
+            try:
+                future.result()
+            except Exception:
+                logger.exception("Cache warmer couldn't load time entries")
+
+    return {"months": len(months), "tickets": len(ticket_ids), "companies": len(company_ids)}
+
+
+def run_forever(api: FreshdeskAPI = freshdesk_api, interval: int = WARM_INTERVAL):
+    """Warm the caches every `interval` seconds until the process exits."""
+    while True:
+        started = time.time()
+        try:
+            counts = warm_caches(api)
+            logger.info("Cache warmer: warmed %s tickets and %s companies in %.0f s", counts["tickets"], counts["companies"], time.time() - started)
+            # The sync reuses the month listings and tickets warmed above, so it mostly reads from the caches
+            sync_months(months_to_warm(), api, listed_after=started)
+        except Exception:
+            logger.exception("Cache warmer pass failed")
+        time.sleep(max(0, interval - (time.time() - started)))
+
+
+@st.cache_resource
+def start_cache_warmer() -> Optional[threading.Thread]:
+    """
+    Start the warmer in a daemon thread, once per server process.
+
+    Set SUPPORT_REPORTS_CACHE_WARMER=0 to turn it off (e.g. when developing).
+    """
+    if os.environ.get("SUPPORT_REPORTS_CACHE_WARMER", "1") == "0":
+        return None
+    thread = threading.Thread(target=run_forever, name="cache-warmer", daemon=True)
+    thread.start()
+    return thread
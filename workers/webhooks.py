@@ -0,0 +1,169 @@
+"""
+Receiver for Freshdesk webhooks that keeps the caches up to date as tickets and time entries change.
+
+Freshdesk automation rules post a JSON body such as
+
+    {"event": "ticket_updated", "ticket_id": {{ticket.id}}}
+    {"event": "time_entry_updated", "ticket_id": {{ticket.id}}, "executed_at": "2024-05-02"}
+
+to http://<host>:<port>/freshdesk with an X-Webhook-Token header matching the
+`webhook_secret` secret. Ticket events refetch just that ticket; time entry
+events drop just the cached time entry lists the entry could be part of.
+
+To try it against a running app, post an event from the command line:
+
+    python -m workers.webhooks ticket_updated 12345
+    python -m workers.webhooks time_entry_created 12345 --executed-at 2024-05-02
+"""
+import argparse
+import hmac
+import json
+import logging
+import os
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+import streamlit as st
+
+from apis.freshdesk import FreshdeskAPI, freshdesk_api
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_PATH = "/freshdesk"
+WEBHOOK_PORT = int(os.environ.get("SUPPORT_REPORTS_WEBHOOK_PORT", "8765"))
+TOKEN_HEADER = "X-Webhook-Token"
+
+TICKET_EVENTS = {"ticket_created", "ticket_updated"}
+DELETED_TICKET_EVENTS = {"ticket_deleted"}
+TIME_ENTRY_EVENTS = {"time_entry_created", "time_entry_updated", "time_entry_deleted"}
+
+
+def apply_event(payload: Dict, api: FreshdeskAPI = freshdesk_api) -> str:
+    """
+    Update the caches for one webhook payload.
+
+    Returns:
+        str: A short description of what was done, for the response and the log.
+
+    Raises:
+        ValueError: If the payload isn't an event we understand.
+    """
+    event = payload.get("event")
+    try:
+        ticket_id = int(payload["ticket_id"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Payload needs a numeric ticket_id")
+
+    if event in TICKET_EVENTS:
+        api.refresh_ticket(ticket_id)
+        return f"Refreshed ticket {ticket_id}"
+    if event in DELETED_TICKET_EVENTS:
+        api.forget_ticket(ticket_id)
+        return f"Forgot ticket {ticket_id}"
+    if event in TIME_ENTRY_EVENTS:
+        executed_at = payload.get("executed_at")
+        company_id = payload.get("company_id")
+        dropped = api.invalidate_time_entries(
+            ticket_id,
+            executed_at=str(executed_at)[:10] if executed_at else None,
+            company_id=int(company_id) if company_id else None,
+        )
+        return f"Dropped {dropped} cached time entry lists for ticket {ticket_id}"
+    raise ValueError(f"Unknown event: {event!r}")
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    secret: Optional[str] = None
+    api: FreshdeskAPI = freshdesk_api
+
+    def do_POST(self):
+        if self.path != WEBHOOK_PATH:
+            self._respond(404, "Not found")
+            return
+        # Compared as bytes: compare_digest rejects non-ASCII strings. Headers are decoded as latin-1,
+        # so encoding them back gives the bytes that were sent.
+        token = self.headers.get(TOKEN_HEADER, "").encode("latin-1")
+        if self.secret is None or not hmac.compare_digest(token, self.secret.encode()):
+            self._respond(401, "Bad token")
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            message = apply_event(payload, self.api)
+        except ValueError as e:
+            self._respond(400, str(e))
+            return
+        except Exception:
+            logger.exception("Webhook failed")
+            self._respond(500, "Failed to apply event")
+            return
+        logger.info("Webhook: %s", message)
+        self._respond(200, message)
+
+    def _respond(self, status: int, message: str):
+        body = message.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Events are logged by do_POST; skip the per-request access log
+        pass
+
+
+@st.cache_resource
+def start_webhook_server(port: int = WEBHOOK_PORT) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve webhooks from a daemon thread, once per server process.
+
+    Runs in the app's own process so it can update the in-memory caches. Not
+    started unless the `webhook_secret` secret is set.
+    """
+    secret = st.secrets.get("webhook_secret")
+    if not secret:
+        return None
+    handler = type("ConfiguredWebhookHandler", (WebhookHandler,), {"secret": secret})
+    try:
+        server = ThreadingHTTPServer(("", port), handler)
+    except OSError:
+        logger.exception("Couldn't start webhook receiver on port %s", port)
+        return None
+    threading.Thread(target=server.serve_forever, name="webhooks", daemon=True).start()
+    return server
+
+
+def post_event(payload: Dict, url: str, secret: str) -> str:
+    """Post an event to a running receiver, the way Freshdesk would."""
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json", TOKEN_HEADER: secret},
+        method="POST",
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.read().decode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Post a test Freshdesk webhook event to a running app.")
+    parser.add_argument("event", choices=sorted(TICKET_EVENTS | DELETED_TICKET_EVENTS | TIME_ENTRY_EVENTS))
+    parser.add_argument("ticket_id", type=int)
+    parser.add_argument("--executed-at", help="Time entry date (YYYY-MM-DD)")
+    parser.add_argument("--company-id", type=int)
+    parser.add_argument("--url", default=f"http://localhost:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    args = parser.parse_args()
+
+    payload = {"event": args.event, "ticket_id": args.ticket_id}
+    if args.executed_at:
+        payload["executed_at"] = args.executed_at
+    if args.company_id:
+        payload["company_id"] = args.company_id
+    print(post_event(payload, args.url, st.secrets["webhook_secret"]))
+
+
+if __name__ == "__main__":
+    main()